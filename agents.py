@@ -1,7 +1,8 @@
 from dotenv import load_dotenv
 import os
-from crewai import Agent, LLM
-from tools import search_tool
+from crewai import Agent
+from llm_client import ResilientLLM
+from tools import market_data_tool, search_tool
 
 # Load .env file (make sure it's in the project root)
 load_dotenv()
@@ -15,13 +16,13 @@ if not groq_key:
 
 # --- Initialize LLM (Groq with Llama 3.3 70B Versatile) ---
 # Using llama-3.3-70b-versatile: Latest model with better tool use capabilities
-llm = LLM(
+llm = ResilientLLM(
     model="groq/llama-3.3-70b-versatile",
     api_key=groq_key,
     temperature=0.1,
-    max_tokens=6000,  # Increased for better responses
+    max_tokens=6000,  # Ceiling; per-call reservation comes from token_budget.py
     timeout=180,  # 3 minutes
-    max_retries=3,
+    max_retries=0,  # Retries handled per call by retry_policy
 )
 
 # --- Agents ---
@@ -29,14 +30,16 @@ property_researcher = Agent(
     llm=llm,
     role="Retail Property Research Analyst",
     goal="Research and identify the top 3 retail property investment neighborhoods in the specified city with real market data.",
-    backstory="""You are an experienced retail property analyst. You MUST use the search tool to find current, 
-    real market data about retail properties. Search for terms like 'retail property investment [city name]', 
-    'best neighborhoods for retail business [city]', 'commercial real estate [city]'.
-    
-    After searching, analyze the results and provide specific neighborhood names, realistic price ranges, 
-    and rental yield estimates based on the search findings.""",
+    backstory="""You are an experienced retail property analyst. First check the local market data tool,
+    which holds our own neighborhood prices and yields. Only if it doesn't cover the city, use the search
+    tool to find current, real market data about retail properties. Search for terms like
+    'retail property investment [city name]', 'best neighborhoods for retail business [city]',
+    'commercial real estate [city]'.
+
+    Then provide specific neighborhood names, realistic price ranges, and rental yield estimates
+    based on those findings.""",
     allow_delegation=False,
-    tools=[search_tool],
+    tools=[market_data_tool, search_tool],  # Local data first, web search for gaps
     verbose=True,
 )
 
@@ -49,8 +52,10 @@ property_analyst = Agent(
     - Specific neighborhood names
     - Clear price figures (with currency symbols)
     - Percentage-based rental yields
-    - Brief but specific investment rationale for each area""",
+    - Brief but specific investment rationale for each area
+    Use the local market data tool to check or fill in figures for a neighborhood.""",
     allow_delegation=False,
+    tools=[market_data_tool],
     verbose=True,
 )
 
@@ -1,7 +1,8 @@
 from dotenv import load_dotenv
 import os
-from crewai import Agent, LLM
-from tools import search_tool
+from crewai import Agent
+from llm_client import ResilientLLM
+from tools import market_data_tool, search_tool
 
 load_dotenv()
 
@@ -11,13 +12,13 @@ if not groq_key:
     raise ValueError("❌ GROQ_API_KEY not found. Please add it to your .env file.")
 
 # Optimized LLM configuration - reduced tokens and temperature
-llm = LLM(
+llm = ResilientLLM(
     model="groq/llama-3.3-70b-versatile",
     api_key=groq_key,
     temperature=0.1,
-    max_tokens=2000,  # Reduced from 6000 to save API quota
+    max_tokens=2000,  # Ceiling; per-call reservation comes from token_budget.py
     timeout=120,  # Reduced timeout
-    max_retries=2,  # Reduced retries
+    max_retries=0,  # Retries handled per call by retry_policy
 )
 
 # Single agent instead of two - reduces API calls by 50%
@@ -26,8 +27,32 @@ property_analyst = Agent(
     role="Retail Property Investment Analyst",
     goal="Research and analyze retail property investment opportunities in the specified city.",
     backstory="""Expert analyst who finds and evaluates retail property investments. 
-    You use search tools to find current market data and present clear, actionable insights.""",
+    You check our local market data first and only search the web for what it doesn't cover,
+    then present clear, actionable insights.""",
     allow_delegation=False,
-    tools=[search_tool],
+    tools=[market_data_tool, search_tool],  # Local data first, web search for gaps
     verbose=False,  # Disabled verbose to reduce token usage
 )
+
+# Packed multi-city runs answer for several cities in one response,
+# so they need a higher ceiling; packs are capped to what fits in it
+PACKED_TOKENS_PER_CITY = 600  # One ~400-word city report plus its header
+packed_llm = ResilientLLM(
+    model="groq/llama-3.3-70b-versatile",
+    api_key=groq_key,
+    temperature=0.1,
+    max_tokens=4000,  # Ceiling; per-call reservation comes from token_budget.py
+    timeout=180,
+    max_retries=0,  # Retries handled per call by retry_policy
+)
+
+# Tool-less variant for packed runs: search results are prefetched into the prompt
+packed_property_analyst = Agent(
+    llm=packed_llm,
+    role="Retail Property Investment Analyst",
+    goal="Analyze retail property investment opportunities for several cities from provided search results.",
+    backstory="""Expert analyst who evaluates retail property investments.
+    You work from the search results you are given and present clear, actionable insights per city.""",
+    allow_delegation=False,
+    verbose=False,
+)
@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
 import re
-import altair as alt
+from render_cache import get_report_view, parsed_metrics
+from artifact_store import store
+from profiling import profile_run, profiling_enabled
 from crew import run_property_investment_analysis
 import time
 
@@ -16,6 +18,12 @@ st.info("⚠️ Using free API tier. Analysis may take 1-2 minutes. If rate limi
 
 city_name = st.text_input("Enter a City or Region", placeholder="e.g., Berlin, Tokyo, New York, London")
 
+profile_runs = st.sidebar.toggle(
+    "🧪 Profile runs",
+    value=profiling_enabled(),
+    help="Save cProfile, flamegraph and allocation data for each run to the profiles/ folder",
+)
+
 def extract_metrics_from_text(text: str):
     """
     Enhanced extraction of metrics from agent output text.
@@ -97,7 +105,8 @@ if st.button("🔍 Run Analysis", type="primary"):
     if not city_name.strip():
         st.warning("⚠️ Please enter a valid city name.")
     else:
-        with st.spinner(f"🔎 Researching retail investment opportunities in {city_name}... This may take 1-2 minutes."):
+        with st.spinner(f"🔎 Researching retail investment opportunities in {city_name}... This may take 1-2 minutes."), \
+                profile_run(f"app-{city_name}", enabled=profile_runs):
             try:
                 result = run_property_investment_analysis(city_name)
                 st.success(f"✅ Analysis completed for {city_name}!")
@@ -110,8 +119,14 @@ if st.button("🔍 Run Analysis", type="primary"):
                 else:
                     output_text = str(result)
 
-                # Extract metrics
-                metrics, neighborhoods, df = extract_metrics_from_text(output_text)
+                # Extract metrics (memoized on the report's content hash)
+                view = get_report_view(output_text, extract_metrics_from_text)
+                metrics = view["metrics"]
+                neighborhoods = view["neighborhoods"]
+                df = view["df"]
+
+                # Store the parsed metrics alongside the run's other artifacts
+                store.attach_metrics(output_text, parsed_metrics(view))
 
                 # Display metrics
                 st.markdown("### 📊 Investment Overview")
@@ -133,25 +148,11 @@ if st.button("🔍 Run Analysis", type="primary"):
                     if df is not None and not df.empty and len(df) > 0:
                         st.markdown("**💰 Price Comparison**")
                         
-                        # Price chart
-                        price_chart = (
-                            alt.Chart(df)
-                            .mark_bar(color="#1f77b4", size=40)
-                            .encode(
-                                x=alt.X("Neighborhood:N", title="Neighborhood", sort="-y"),
-                                y=alt.Y("Avg Price ($):Q", title="Average Price ($)"),
-                                tooltip=["Neighborhood", "Avg Price ($)", "Rental Yield (%)"]
-                            )
-                            .properties(height=300)
-                        )
-                        st.altair_chart(price_chart, use_container_width=True)
+                        st.vega_lite_chart(view["chart_spec"], use_container_width=True)
                         
                         # Show data table
                         st.markdown("**📋 Detailed Metrics**")
-                        display_df = df.copy()
-                        display_df["Avg Price ($)"] = display_df["Avg Price ($)"].apply(lambda x: f"${x:,.0f}")
-                        display_df["Rental Yield (%)"] = display_df["Rental Yield (%)"].apply(lambda x: f"{x:.1f}%")
-                        st.dataframe(display_df, use_container_width=True, hide_index=True)
+                        st.dataframe(view["display_df"], use_container_width=True, hide_index=True)
                     else:
                         st.info("💡 Chart data not available. Check full report below for details.")
 
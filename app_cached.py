@@ -1,12 +1,19 @@
 import streamlit as st
 import pandas as pd
 import re
-import altair as alt
-from crew_optimized import run_property_investment_analysis
+from render_cache import get_report_view, parsed_metrics
+from artifact_store import store
+from profiling import profile_run, profiling_enabled
+from city_index import canonical_city_key, canonicalize_city
+from log_capture import capture_stdout
+from http_pool import pool_stats
+from scheduler import scheduler
+from prefetch import SpeculativePrefetcher
+from crew_optimized import run_property_investment_analysis, reuse_if_inputs_unchanged, prefetch_search_context
 import time
 import hashlib
-import sys
-from io import StringIO
+import uuid
+from collections import deque
 
 st.set_page_config(
     page_title="🏙️ Property Investment Research Assistant",
@@ -22,15 +29,37 @@ if 'cache' not in st.session_state:
     st.session_state.cache = {}
 if 'cache_time' not in st.session_state:
     st.session_state.cache_time = {}
+# Insertion-ordered cache keys and display names, so expiry and the sidebar
+# listing only touch the oldest/newest entries instead of scanning everything
+if 'cache_order' not in st.session_state:
+    st.session_state.cache_order = deque()
+if 'cache_cities' not in st.session_state:
+    st.session_state.cache_cities = {}
 
 CACHE_DURATION = 3600  # 1 hour in seconds
 
 def get_cache_key(city_name):
-    """Generate cache key for city."""
-    return hashlib.md5(city_name.lower().strip().encode()).hexdigest()
+    """Generate cache key for city (aliases like "NYC" and "New York, NY" share one key)."""
+    return hashlib.md5(canonical_city_key(city_name).encode()).hexdigest()
+
+def display_city_name(city_name):
+    """Canonical city name for display, falling back to the user's input."""
+    match = canonicalize_city(city_name)
+    return match.name if match else city_name.strip()
+
+def prune_expired_cache():
+    """Drop expired entries from the front of the insertion-ordered cache."""
+    order = st.session_state.cache_order
+    now = time.time()
+    while order and now - st.session_state.cache_time.get(order[0], 0) >= CACHE_DURATION:
+        expired_key = order.popleft()
+        st.session_state.cache.pop(expired_key, None)
+        st.session_state.cache_time.pop(expired_key, None)
+        st.session_state.cache_cities.pop(expired_key, None)
 
 def get_cached_result(city_name):
     """Get cached result if available and not expired."""
+    prune_expired_cache()
     cache_key = get_cache_key(city_name)
     if cache_key in st.session_state.cache:
         cache_age = time.time() - st.session_state.cache_time.get(cache_key, 0)
@@ -43,9 +72,36 @@ def set_cached_result(city_name, result):
     cache_key = get_cache_key(city_name)
     st.session_state.cache[cache_key] = result
     st.session_state.cache_time[cache_key] = time.time()
+    st.session_state.cache_cities[cache_key] = display_city_name(city_name)
+    # Move refreshed keys to the back so the deque stays ordered by cache time
+    if cache_key in st.session_state.cache_order:
+        st.session_state.cache_order.remove(cache_key)
+    st.session_state.cache_order.append(cache_key)
 
 city_name = st.text_input("Enter a City or Region", placeholder="e.g., Berlin, Tokyo, New York, London")
 
+profile_runs = st.sidebar.toggle(
+    "🧪 Profile runs",
+    value=profiling_enabled(),
+    help="Save cProfile, flamegraph and allocation data for each run to the profiles/ folder",
+)
+
+@st.cache_resource
+def get_prefetcher():
+    """One prefetcher (and worker pool) shared by every session."""
+    return SpeculativePrefetcher(prefetch_search_context)
+
+if 'prefetch_owner' not in st.session_state:
+    st.session_state.prefetch_owner = uuid.uuid4().hex
+
+# Speculative prefetch: the input commits on Enter or focus change, usually
+# well before "Run Analysis" is clicked, so start the searches right away
+prefetcher = get_prefetcher()
+if city_name.strip() and get_cached_result(city_name) is None:
+    prefetcher.prefetch(city_name, owner=st.session_state.prefetch_owner)
+else:
+    prefetcher.cancel(st.session_state.prefetch_owner)
+
 def extract_metrics_from_text(text: str):
     """Extract metrics from agent output text."""
     metrics = {}
@@ -132,139 +188,151 @@ if st.button("🔍 Run Analysis", type="primary"):
     if not city_name.strip():
         st.warning("⚠️ Please enter a valid city name.")
     else:
-        # Check cache first
-        cached_result = get_cached_result(city_name)
-        
-        if cached_result:
-            st.success(f"📦 Using cached results for {city_name} (saved within last hour)")
-            output_text = cached_result
-        else:
-            # Create progress container
-            progress_container = st.container()
-            progress_text = progress_container.empty()
-            log_container = st.expander("🔍 **Live Process Log**", expanded=True)
-            
-            # Capture stdout for verbose output
-            log_capture = StringIO()
-            
-            # Progress callback
-            def update_progress(message):
-                progress_text.info(message)
-                log_container.markdown(f"- {message}")
-            
-            try:
-                update_progress(f"🚀 Initializing analysis for **{city_name}**...")
-                time.sleep(0.5)
-                
-                # Capture verbose output
-                old_stdout = sys.stdout
-                sys.stdout = log_capture
-                
+        # Profile the whole run + render path when enabled; the with-block also closes
+        # the profile when st.stop() or a Streamlit rerun interrupts the script
+        with profile_run(f"app-{city_name}", enabled=profile_runs):
+            # Check cache first
+            cached_result = get_cached_result(city_name)
+
+            if cached_result:
+                st.success(f"📦 Using cached results for {city_name} (saved within last hour)")
+                output_text = cached_result
+            else:
+                # Create progress container
+                progress_container = st.container()
+                progress_text = progress_container.empty()
+                log_container = st.expander("🔍 **Live Process Log**", expanded=True)
+
+                # Progress callback
+                def update_progress(message):
+                    progress_text.info(message)
+                    log_container.markdown(f"- {message}")
+
                 try:
-                    result = run_property_investment_analysis(city_name, update_progress)
-                finally:
-                    sys.stdout = old_stdout
-                
-                # Show captured logs
-                captured_output = log_capture.getvalue()
-                if captured_output:
-                    with log_container:
-                        st.code(captured_output, language="text")
-                
-                # Handle different result formats
-                if isinstance(result, dict):
-                    output_text = result.get("output", str(result))
-                elif hasattr(result, 'raw'):
-                    output_text = result.raw
-                else:
-                    output_text = str(result)
-                
-                # Cache the result
-                set_cached_result(city_name, output_text)
-                progress_text.empty()
-                
-            except Exception as e:
-                sys.stdout = old_stdout
-                error_msg = str(e)
-                if "rate_limit" in error_msg.lower():
-                    st.error("⏱️ **Rate Limit Reached**: Please wait 60 seconds before trying again.")
-                    st.info("💡 Consider upgrading at https://console.groq.com/settings/billing")
-                else:
-                    st.error(f"❌ Error: {e}")
-                    st.info("Please try again or try a different city.")
-                st.stop()
-        
-        st.success(f"✅ Analysis completed for **{city_name}**!")
+                    update_progress(f"🚀 Initializing analysis for **{city_name}**...")
+                    time.sleep(0.5)
 
-        # Extract metrics
-        metrics, neighborhoods, df = extract_metrics_from_text(output_text)
+                    # Join the speculative prefetch rather than repeating its searches;
+                    # if it's still queued behind batch work after a few seconds, search ourselves
+                    if prefetcher.wait(city_name, owner=st.session_state.prefetch_owner):
+                        update_progress("⚡ Search results were prefetched while you typed")
 
-        # Display metrics
-        st.markdown("### 📊 Investment Overview")
-        
-        cols = st.columns([1, 2])
-        
-        with cols[0]:
-            if metrics:
-                for key, val in metrics.items():
-                    st.metric(label=key, value=f"{val:.2f}%")
-            
-            if neighborhoods:
-                st.markdown("**📍 Top Neighborhoods:**")
-                for i, neighborhood in enumerate(neighborhoods[:3], 1):
-                    st.write(f"{i}. {neighborhood}")
-        
-        with cols[1]:
-            # Visualization
-            if df is not None and not df.empty and len(df) > 0:
-                st.markdown("**💰 Price Comparison**")
-                
-                price_chart = (
-                    alt.Chart(df)
-                    .mark_bar(color="#1f77b4", size=40)
-                    .encode(
-                        x=alt.X("Neighborhood:N", title="Neighborhood", sort="-y"),
-                        y=alt.Y("Avg Price ($):Q", title="Average Price ($)"),
-                        tooltip=["Neighborhood", "Avg Price ($)", "Rental Yield (%)"]
-                    )
-                    .properties(height=300)
-                )
-                st.altair_chart(price_chart, use_container_width=True)
-                
-                st.markdown("**📋 Detailed Metrics**")
-                display_df = df.copy()
-                display_df["Avg Price ($)"] = display_df["Avg Price ($)"].apply(lambda x: f"${x:,.0f}")
-                display_df["Rental Yield (%)"] = display_df["Rental Yield (%)"].apply(lambda x: f"{x:.1f}%")
-                st.dataframe(display_df, use_container_width=True, hide_index=True)
-            else:
-                st.info("💡 Chart data not available. Check full report below.")
+                    # Cheap refresh first: re-run only the searches and reuse the last
+                    # stored report if the market data behind it hasn't changed
+                    reused_report, search_inputs = reuse_if_inputs_unchanged(city_name, update_progress)
 
-        # Full report
-        with st.expander("📋 Full Analysis Report", expanded=False):
-            st.markdown(output_text)
+                    if reused_report is not None:
+                        update_progress("♻️ Market data unchanged since the last analysis. Reusing its report.")
+                        output_text = reused_report
+                    else:
+                        # Capture verbose output (per session thread, safe with concurrent users)
+                        with capture_stdout() as log_capture:
+                            result = run_property_investment_analysis(
+                                city_name, update_progress, search_inputs=search_inputs
+                            )
+
+                        # Show captured logs
+                        captured_output = log_capture.getvalue()
+                        if captured_output:
+                            with log_container:
+                                st.code(captured_output, language="text")
+
+                        # Handle different result formats
+                        if isinstance(result, dict):
+                            output_text = result.get("output", str(result))
+                        elif hasattr(result, 'raw'):
+                            output_text = result.raw
+                        else:
+                            output_text = str(result)
+
+                    # Cache the result
+                    set_cached_result(city_name, output_text)
+                    progress_text.empty()
+
+                except Exception as e:
+                    error_msg = str(e)
+                    if "rate_limit" in error_msg.lower():
+                        st.error("⏱️ **Rate Limit Reached**: Please wait 60 seconds before trying again.")
+                        st.info("💡 Consider upgrading at https://console.groq.com/settings/billing")
+                    else:
+                        st.error(f"❌ Error: {e}")
+                        st.info("Please try again or try a different city.")
+                    st.stop()
+
+            st.success(f"✅ Analysis completed for **{city_name}**!")
+
+            # Extract metrics (memoized on the report's content hash)
+            view = get_report_view(output_text, extract_metrics_from_text)
+            metrics = view["metrics"]
+            neighborhoods = view["neighborhoods"]
+            df = view["df"]
+
+            if cached_result is None:
+                # Store the parsed metrics alongside the run's other artifacts
+                store.attach_metrics(output_text, parsed_metrics(view))
+
+            # Display metrics
+            st.markdown("### 📊 Investment Overview")
+
+            cols = st.columns([1, 2])
+
+            with cols[0]:
+                if metrics:
+                    for key, val in metrics.items():
+                        st.metric(label=key, value=f"{val:.2f}%")
+
+                if neighborhoods:
+                    st.markdown("**📍 Top Neighborhoods:**")
+                    for i, neighborhood in enumerate(neighborhoods[:3], 1):
+                        st.write(f"{i}. {neighborhood}")
+
+            with cols[1]:
+                # Visualization
+                if df is not None and not df.empty and len(df) > 0:
+                    st.markdown("**💰 Price Comparison**")
+
+                    st.vega_lite_chart(view["chart_spec"], use_container_width=True)
+
+                    st.markdown("**📋 Detailed Metrics**")
+                    st.dataframe(view["display_df"], use_container_width=True, hide_index=True)
+                else:
+                    st.info("💡 Chart data not available. Check full report below.")
+
+            # Full report
+            with st.expander("📋 Full Analysis Report", expanded=False):
+                st.markdown(output_text)
 
 # Show cache info
+prune_expired_cache()
 if st.session_state.cache:
     with st.sidebar:
         st.markdown("### 📦 Cached Cities")
         st.caption(f"Results cached for {CACHE_DURATION // 60} minutes")
         
-        # Get city names from cache
-        cached_cities = []
-        for cache_key in st.session_state.cache_time.keys():
-            cache_age = time.time() - st.session_state.cache_time[cache_key]
-            if cache_age < CACHE_DURATION:
-                mins_ago = int(cache_age / 60)
-                cached_cities.append(f"• Cached {mins_ago}m ago")
-        
-        for city_info in cached_cities[:5]:  # Show max 5
-            st.text(city_info)
+        # Newest entries live at the back of the deque; only read the last 5
+        now = time.time()
+        order = st.session_state.cache_order
+        for idx in range(len(order) - 1, max(len(order) - 6, -1), -1):  # Show max 5
+            cache_key = order[idx]
+            mins_ago = int((now - st.session_state.cache_time[cache_key]) / 60)
+            city_label = st.session_state.cache_cities.get(cache_key, "City")
+            st.text(f"• {city_label} (cached {mins_ago}m ago)")
         
         if st.button("🗑️ Clear Cache"):
             st.session_state.cache = {}
             st.session_state.cache_time = {}
+            st.session_state.cache_order = deque()
+            st.session_state.cache_cities = {}
             st.rerun()
 
+# Keep-alive pool shared by Serper and Groq calls
+with st.sidebar.expander("🔌 Connection Pool", expanded=False):
+    st.json(pool_stats())
+
+# Shared Groq/Serper quota between interactive users and batch jobs
+with st.sidebar.expander("🚦 Scheduler", expanded=False):
+    st.json(scheduler.stats())
+
 # Footer
 st.markdown("---")
 st.markdown("*Powered by CrewAI + Groq + Serper* | Optimized with caching and live progress")
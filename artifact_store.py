@@ -0,0 +1,311 @@
+import atexit
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from city_index import canonical_city_key
+
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "artifacts")
+FLUSH_TIMEOUT = 10  # Seconds flush() waits for queued writes, e.g. at exit
+# Writes waiting for the writer thread; beyond this new writes are dropped (and logged)
+# rather than blocking the request path or growing memory without bound
+ARTIFACT_QUEUE_SIZE = int(os.getenv("ARTIFACT_QUEUE_SIZE", "1000"))
+WRITER_RESTART_DELAY = 30  # Seconds before a dead writer thread is restarted
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    city TEXT NOT NULL,
+    city_key TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    report_hash TEXT,
+    metrics_hash TEXT,
+    search_hash TEXT,
+    timings_hash TEXT,
+    input_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_city_time ON runs (city_key, created_at);
+CREATE INDEX IF NOT EXISTS runs_report ON runs (report_hash);
+"""
+
+
+def city_key(city_name: str) -> str:
+    """Index key for a city; aliases of a known city share its canonical ID."""
+    return canonical_city_key(city_name)
+
+
+def _encode(payload) -> bytes:
+    if isinstance(payload, str):
+        return payload.encode("utf-8")
+    return json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+
+
+def content_hash(payload) -> str:
+    """Hash used to address an artifact; identical content shares one blob."""
+    return hashlib.sha256(_encode(payload)).hexdigest()
+
+
+class ArtifactStore:
+    """
+    Content-addressed, gzip-compressed store for per-run artifacts.
+
+    Blobs live under ``objects/<hash[:2]>/<hash>.gz`` and a SQLite index maps
+    runs to their blobs by city and timestamp. All writes go through one
+    background thread so saving never blocks the request path; if that
+    thread falls behind by ``queue_size`` writes, further writes are dropped.
+    """
+
+    def __init__(self, root: str = ARTIFACT_DIR, queue_size: int = ARTIFACT_QUEUE_SIZE):
+        self.root = root
+        self.index_path = os.path.join(root, "index.sqlite")
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._writer_error = None
+        self._writer_stopped_at = None
+        self._writer_lock = threading.Lock()
+        self.dropped_writes = 0
+
+    # --- Write path (background thread) ---
+
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            if self._writer is not None:
+                # Queued writes wait for the restart; new ones are dropped once the queue fills
+                if time.monotonic() - (self._writer_stopped_at or 0) < WRITER_RESTART_DELAY:
+                    return
+                print(f"⚠️ Restarting artifact writer, which stopped after: {self._writer_error or 'unknown error'}")
+            self._writer = threading.Thread(target=self._write_loop, name="artifact-writer", daemon=True)
+            self._writer.start()
+
+    def _writer_stopped(self, reason: str):
+        self._writer_error = reason
+        self._writer_stopped_at = time.monotonic()
+        print(f"⚠️ Artifact writer stopped: {reason}")
+
+    def _write_loop(self):
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(self.index_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Indexes created before input fingerprints were tracked lack the column
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+            if "input_hash" not in columns:
+                conn.execute("ALTER TABLE runs ADD COLUMN input_hash TEXT")
+        except (OSError, sqlite3.Error) as e:
+            self._writer_stopped(f"artifact store unavailable at {self.root}: {e}")
+            return
+        try:
+            while True:
+                job = self._queue.get()
+                try:
+                    job(conn)
+                    conn.commit()
+                except Exception as e:
+                    print(f"⚠️ Failed to write artifact: {e}")
+                finally:
+                    self._queue.task_done()
+        except BaseException as e:
+            self._writer_stopped(repr(e))
+            raise
+
+    def _submit(self, job):
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._writer_lock:
+                self.dropped_writes += 1
+                dropped = self.dropped_writes
+            print(f"⚠️ Artifact write queue full; dropped a write ({dropped} so far)")
+
+    def _put_blob(self, payload) -> str:
+        digest = content_hash(payload)
+        path = os.path.join(self.root, "objects", digest[:2], f"{digest}.gz")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(_encode(payload))
+            os.replace(tmp_path, path)
+        return digest
+
+    def save_run(self, city_name: str, report: str, search_inputs=None, timings=None, metrics=None,
+                 input_hash: str = None) -> str:
+        """
+        Queue one run's artifacts for storage and return its run ID immediately.
+
+        Args:
+            city_name: City the run analysed
+            report: Raw report text from the crew
+            search_inputs: List of search queries and their results
+            timings: Dict of timing measurements in seconds
+            metrics: Parsed metrics, if already available
+            input_hash: Fingerprint of the normalized search inputs, used to
+                skip re-analysis when the market data hasn't changed
+        """
+        run_id = uuid.uuid4().hex
+        created_at = time.time()
+
+        def job(conn):
+            hashes = [
+                self._put_blob(part) if part is not None else None
+                for part in (report, metrics, search_inputs, timings)
+            ]
+            conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, city_name.strip(), city_key(city_name), created_at, *hashes, input_hash),
+            )
+
+        self._submit(job)
+        return run_id
+
+    def attach_metrics(self, report: str, metrics):
+        """Attach parsed metrics to every stored run that produced this report."""
+        report_hash = content_hash(report)
+
+        def job(conn):
+            metrics_hash = self._put_blob(metrics)
+            conn.execute(
+                "UPDATE runs SET metrics_hash = ? WHERE report_hash = ? AND metrics_hash IS NULL",
+                (metrics_hash, report_hash),
+            )
+
+        self._submit(job)
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT) -> bool:
+        """
+        Block until all queued writes have finished.
+
+        Returns:
+            False if writes are still pending after ``timeout`` seconds or the
+            writer thread has died (e.g. the index couldn't be opened)
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._writer is None or not self._writer.is_alive():
+                    print(f"⚠️ {self._queue.unfinished_tasks} artifact write(s) not flushed")
+                    return False
+                self._queue.all_tasks_done.wait(min(remaining, 0.1))
+        return True
+
+    # --- Read path ---
+
+    def _query(self, sql, params=()):
+        if not os.path.exists(self.index_path):
+            return []
+        conn = sqlite3.connect(self.index_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def list_runs(self, city_name: str, since: float = None, limit: int = 20):
+        """Return index rows for a city, newest first."""
+        return self._query(
+            "SELECT * FROM runs WHERE city_key = ? AND created_at >= ? ORDER BY created_at DESC LIMIT ?",
+            (city_key(city_name), since or 0, limit),
+        )
+
+    def latest_run(self, city_name: str):
+        """Return the newest index row for a city, or None."""
+        runs = self.list_runs(city_name, limit=1)
+        return runs[0] if runs else None
+
+    def runs_with_report(self, report: str):
+        """Return every run whose report is byte-identical to ``report``."""
+        return self._query(
+            "SELECT * FROM runs WHERE report_hash = ? ORDER BY created_at DESC",
+            (content_hash(report),),
+        )
+
+    def load(self, digest: str, as_json: bool = False):
+        """
+        Load and decompress a blob by hash.
+
+        Args:
+            digest: Blob hash from an index row
+            as_json: Decode the blob as JSON (metrics, search inputs, timings)
+                instead of returning raw bytes (reports are plain text)
+        """
+        path = os.path.join(self.root, "objects", digest[:2], f"{digest}.gz")
+        with gzip.open(path, "rb") as f:
+            data = f.read()
+        return json.loads(data) if as_json else data
+
+
+store = ArtifactStore()
+atexit.register(store.flush)
+
+
+class RunRecorder:
+    """Collects search inputs and timings while one analysis runs."""
+
+    def __init__(self, city_name: str):
+        self.city_name = city_name
+        self.started_at = time.perf_counter()
+        self.search_inputs = []
+        self.timings = {"searches": []}
+        self.report = None
+        self.input_hash = None
+
+    def record_search(self, query: dict, result, duration: float):
+        self.search_inputs.append({"query": query, "result": result})
+        self.timings["searches"].append(round(duration, 4))
+
+    def find_search(self, query: dict):
+        """Result of an identical search already made in this run, or None."""
+        for item in self.search_inputs:
+            if item["query"] == query:
+                return item["result"]
+        return None
+
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+def current_run():
+    """Return the RunRecorder for the analysis in progress, if any."""
+    return _current_run.get()
+
+
+def report_text(result) -> str:
+    """Normalise a crew result to its report text."""
+    if isinstance(result, dict):
+        return result.get("output", str(result))
+    if hasattr(result, "raw"):
+        return result.raw
+    return str(result)
+
+
+@contextmanager
+def record_run(city_name: str):
+    """
+    Record one analysis run and queue its artifacts when the block exits.
+
+    Set ``recorder.report`` inside the block; runs without a report are not saved.
+    """
+    recorder = RunRecorder(city_name)
+    token = _current_run.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_run.reset(token)
+    if recorder.report is not None:
+        recorder.timings["total"] = round(time.perf_counter() - recorder.started_at, 4)
+        store.save_run(
+            city_name, recorder.report, recorder.search_inputs, recorder.timings,
+            input_hash=recorder.input_hash,
+        )
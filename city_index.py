@@ -0,0 +1,233 @@
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.json")
+
+# Minimum similarity for a fuzzy (typo-tolerant) match
+FUZZY_THRESHOLD = 0.85
+# Short names need a closer match: one swapped letter in a short name is as
+# likely another real city ("Homburg" vs "Hamburg") as a typo, while a dropped
+# or doubled letter ("Berln", "Hamburgg") still matches
+SHORT_NAME_LENGTH = 10
+SHORT_NAME_FUZZY_THRESHOLD = 0.9
+
+# Words that don't change which city is meant ("Greater London", "NYC metro")
+_FILLER_WORDS = {"city", "metro", "greater", "area", "downtown", "region", "the"}
+
+# Country names accepted as a ", <country>" suffix. State/province suffixes are
+# checked against each city's "regions" in the gazetteer, so "Paris, Texas",
+# "London, Ontario" or "Indore, XY" don't resolve to a different city.
+_COUNTRY_NAMES = {
+    "usa": "US", "united states": "US", "united states of america": "US", "america": "US",
+    "uk": "GB", "united kingdom": "GB", "great britain": "GB", "britain": "GB",
+    "canada": "CA", "mexico": "MX", "brazil": "BR", "argentina": "AR", "ireland": "IE",
+    "france": "FR", "germany": "DE", "deutschland": "DE", "netherlands": "NL", "belgium": "BE",
+    "switzerland": "CH", "austria": "AT", "spain": "ES", "portugal": "PT", "italy": "IT",
+    "greece": "GR", "sweden": "SE", "denmark": "DK", "norway": "NO", "finland": "FI",
+    "poland": "PL", "czechia": "CZ", "czech republic": "CZ", "hungary": "HU", "turkey": "TR",
+    "uae": "AE", "united arab emirates": "AE", "saudi arabia": "SA", "egypt": "EG",
+    "south africa": "ZA", "nigeria": "NG", "kenya": "KE", "india": "IN", "japan": "JP",
+    "south korea": "KR", "korea": "KR", "china": "CN", "hong kong": "HK", "taiwan": "TW",
+    "singapore": "SG", "malaysia": "MY", "thailand": "TH", "indonesia": "ID",
+    "philippines": "PH", "vietnam": "VN", "australia": "AU", "new zealand": "NZ",
+}
+
+
+@dataclass(frozen=True)
+class CityMatch:
+    """A user-entered city resolved against the gazetteer."""
+    id: str
+    name: str
+    country: str
+    score: float
+
+
+def normalize_city(text: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^a-z0-9]+", " ", text.lower())
+    return text.strip()
+
+
+def _trigrams(text: str):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CityIndex:
+    """
+    Offline alias index mapping free-text city names to canonical city IDs.
+
+    Exact alias lookups are a dict hit; typos fall back to a trigram index
+    that narrows candidates before scoring them with difflib.
+    """
+
+    def __init__(self, entries):
+        self._cities = {}
+        self._aliases = {}
+        self._regions = {}
+        self._trigram_index = defaultdict(set)
+
+        for entry in entries:
+            match = CityMatch(entry["id"], entry["name"], entry["country"], 1.0)
+            self._cities[entry["id"]] = match
+            self._regions[entry["id"]] = {normalize_city(region) for region in entry.get("regions", [])}
+            for alias in [entry["name"], *entry.get("aliases", [])]:
+                key = normalize_city(alias)
+                if key:
+                    self._aliases.setdefault(key, entry["id"])
+
+        for alias in self._aliases:
+            for gram in _trigrams(alias):
+                self._trigram_index[gram].add(alias)
+
+    @classmethod
+    def from_file(cls, path: str = GAZETTEER_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _exact(self, key: str):
+        city_id = self._aliases.get(key)
+        return self._cities[city_id] if city_id else None
+
+    def _fuzzy(self, key: str):
+        candidate_counts = defaultdict(int)
+        for gram in _trigrams(key):
+            for alias in self._trigram_index.get(gram, ()):
+                candidate_counts[alias] += 1
+
+        # Only score the handful of aliases sharing the most trigrams
+        best_alias, best_score = None, 0.0
+        for alias, _ in sorted(candidate_counts.items(), key=lambda item: -item[1])[:10]:
+            score = SequenceMatcher(None, key, alias).ratio()
+            if score > best_score:
+                best_alias, best_score = alias, score
+
+        threshold = SHORT_NAME_FUZZY_THRESHOLD if len(key) < SHORT_NAME_LENGTH else FUZZY_THRESHOLD
+        if best_alias and best_score >= threshold:
+            city = self._cities[self._aliases[best_alias]]
+            return CityMatch(city.id, city.name, city.country, round(best_score, 3))
+        return None
+
+    def _match(self, key: str):
+        # Exact before fuzzy; each on the text as given, then without filler words
+        candidates = [key, " ".join(word for word in key.split() if word not in _FILLER_WORDS)]
+        for matcher in (self._exact, self._fuzzy):
+            for candidate in candidates:
+                match = candidate and matcher(candidate)
+                if match:
+                    return match
+        return None
+
+    def _region_matches(self, match: CityMatch, region: str) -> bool:
+        """Whether a ", <region>" suffix is the city's state/province or country."""
+        return (
+            region in self._regions.get(match.id, ())
+            or _COUNTRY_NAMES.get(region) == match.country
+            or region == match.country.lower()
+        )
+
+    def lookup(self, text: str):
+        """
+        Resolve a user-entered city name.
+
+        A ", State/Country" suffix must belong to the city it resolves to; an
+        unknown or mismatched suffix ("Manhattan, Kansas", "London, Ontario")
+        resolves to None rather than to a different city.
+
+        Args:
+            text: Free-text city, e.g. "NYC", "New York, NY" or "Berln"
+
+        Returns:
+            CityMatch, or None if the text isn't a known city
+        """
+        key = normalize_city(text)
+        if not key:
+            return None
+        if "," not in text:
+            return self._match(key)
+
+        # Aliases like "new york ny" already include their region
+        match = self._exact(key)
+        if match:
+            return match
+
+        head, *regions = text.split(",")
+        match = self._match(normalize_city(head))
+        regions = [normalize_city(region) for region in regions if normalize_city(region)]
+        if match and all(self._region_matches(match, region) for region in regions):
+            return match
+        return None
+
+
+@lru_cache(maxsize=1)
+def get_city_index() -> CityIndex:
+    """Return the process-wide gazetteer index, loading it on first use."""
+    return CityIndex.from_file()
+
+
+@lru_cache(maxsize=4096)
+def canonicalize_city(text: str):
+    """Resolve ``text`` to a CityMatch, or None if it isn't in the gazetteer."""
+    return get_city_index().lookup(text)
+
+
+def canonical_city_key(text: str) -> str:
+    """
+    Stable key for caching, dedupe and storage.
+
+    Known cities map to their gazetteer ID so "NYC" and "New York, NY" share
+    one key; unknown cities fall back to their normalized text.
+    """
+    match = canonicalize_city(text)
+    return match.id if match else normalize_city(text)
+
+
+def compare_hit_rates(queries):
+    """
+    Replay a query log against the plain and canonical cache keys.
+
+    Returns:
+        Dict with the hit rate (0-1) of each keying scheme
+    """
+    def hit_rate(key_fn):
+        seen = set()
+        hits = 0
+        for query in queries:
+            key = key_fn(query)
+            if key in seen:
+                hits += 1
+            seen.add(key)
+        return hits / len(queries) if queries else 0.0
+
+    return {
+        "plain": hit_rate(lambda q: q.lower().strip()),
+        "canonical": hit_rate(canonical_city_key),
+    }
+
+
+SAMPLE_QUERIES = [
+    "New York", "NYC", "new york city", "New York, NY", "New York, New York",
+    "London", "london", "London, UK", "Greater London",
+    "Bangalore", "Bengaluru", "bengaluru ",
+    "Munich", "München", "Muenchen",
+    "Berlin", "Berln", "berlin, germany",
+    "San Francisco", "SF", "San Fran",
+    "Tokyo", "tokyo", "Tokyo, Japan",
+    "Mumbai", "Bombay", "Indore", "indore",
+    "Dubai", "Dubai, UAE",
+]
+
+
+if __name__ == "__main__":
+    rates = compare_hit_rates(SAMPLE_QUERIES)
+    print(f"Queries replayed: {len(SAMPLE_QUERIES)}")
+    print(f"Plain key hit rate:     {rates['plain']:.0%}")
+    print(f"Canonical key hit rate: {rates['canonical']:.0%}")
@@ -1,15 +1,42 @@
 from crewai import Crew, Task
-from agents_optimized import property_analyst
-import time
+from agents_optimized import PACKED_TOKENS_PER_CITY, packed_llm, property_analyst, packed_property_analyst
+from artifact_store import content_hash, record_run, report_text, store
+from city_index import canonical_city_key
+from profiling import profile_run
+from retry_policy import request_scope
+from scheduler import Priority, scheduler
+from market_data import as_search_result, get_market_data
+from tools import fresh_searches, search_tool
 import re
+import time
+
+# Overall budget for one analysis, including retry waits on individual calls
+REQUEST_DEADLINE = 300  # 5 minutes
+
+# Searches the single-city task asks the agent to run; packed mode prefetches the same ones
+SEARCH_QUERIES = [
+    "retail property investment {city} best areas",
+    "commercial real estate prices {city}",
+]
+
+# Cities per packed LLM request, and search results per query kept in its prompt
+DEFAULT_PACK_SIZE = 4
+# Largest pack whose reports all fit under the packed LLM's max_tokens ceiling
+MAX_PACK_SIZE = max(1, packed_llm.max_tokens // PACKED_TOKENS_PER_CITY)
+PACKED_RESULTS_PER_QUERY = 5
 
-def run_property_investment_analysis(city_name: str, progress_callback=None):
+def run_property_investment_analysis(city_name: str, progress_callback=None, search_inputs=None,
+                                     priority: Priority = Priority.INTERACTIVE):
     """
     Run property investment analysis for a specific city.
     
     Args:
         city_name: Name of the city to analyze
         progress_callback: Optional callback function to report progress
+        search_inputs: Results of the standard searches, if already fetched
+            (e.g. by reuse_if_inputs_unchanged); fetched here otherwise
+        priority: Scheduling class; bulk jobs should pass Priority.BATCH so
+            interactive users keep first claim on the Groq/Serper quota
     """
     
     # Log progress
@@ -18,9 +45,11 @@ def run_property_investment_analysis(city_name: str, progress_callback=None):
     
     # Create a FRESH task for each city (critical fix for city-specific results)
     analysis_task = Task(
-        description=f"""Search for retail property investment opportunities in {city_name}.
+        name="optimized_analysis_task",  # Budget key shared by every city
+        description=f"""Find retail property investment opportunities in {city_name}.
 
-Search queries to use:
+First look up {city_name} with the local market data tool. If it covers the city, use its data and skip web search.
+Otherwise search the web for the neighborhoods it doesn't cover, using:
 1. "retail property investment {city_name} best areas"
 2. "commercial real estate prices {city_name}"
 
@@ -54,38 +83,266 @@ Keep under 400 words total. IMPORTANT: Provide data specific to {city_name} only
     )
     
     if progress_callback:
-        progress_callback(f"🌐 Searching web for {city_name} property data...")
+        if get_market_data().covers(city_name):
+            progress_callback(f"📚 Using local market data for {city_name}...")
+        else:
+            progress_callback(f"🌐 Searching web for {city_name} property data...")
+
+    if progress_callback:
+        progress_callback("⚙️ Processing analysis...")
+
+    # Retries/backoff happen per LLM and search call (see retry_policy.py),
+    # so a late failure doesn't rerun the searches that already succeeded.
+    # The run's artifacts are saved to the artifact store off the request path.
+    try:
+        with scheduler.admit(priority), \
+                record_run(city_name) as run, \
+                request_scope(timeout=REQUEST_DEADLINE, on_retry=progress_callback), \
+                profile_run(f"analysis-{city_name}"):
+            # Run the standard searches up front so the run's inputs can be
+            # fingerprinted; the agent's identical tool calls are answered from
+            # the run's memo instead of hitting Serper again
+            if search_inputs is None:
+                search_inputs = prefetch_search_context(city_name)
+            for item in search_inputs:
+                # Web searches made just above were already recorded by the tool
+                if run.find_search(item["query"]) is None:
+                    run.record_search(item["query"], item["result"], 0.0)
+            run.input_hash = search_fingerprint(search_inputs)
 
-    # Retry logic
-    max_retries = 2
-    retry_delay = 45
-    
-    for attempt in range(max_retries):
-        try:
-            if progress_callback:
-                progress_callback(f"⚙️ Processing analysis (Attempt {attempt + 1}/{max_retries})...")
-            
             result = crew.kickoff()
-            
-            if progress_callback:
-                progress_callback(f"✅ Analysis complete for {city_name}!")
-            
-            return result
-            
-        except Exception as e:
-            error_msg = str(e)
-            if "rate_limit" in error_msg.lower() and attempt < max_retries - 1:
-                wait_match = re.search(r'try again in ([\d.]+)s', error_msg)
-                if wait_match:
-                    wait_time = float(wait_match.group(1)) + 5
-                else:
-                    wait_time = retry_delay * (2 ** attempt)
-                
-                if progress_callback:
-                    progress_callback(f"⏳ Rate limit hit. Waiting {int(wait_time)}s before retry...")
-                
-                time.sleep(wait_time)
+            run.report = report_text(result)
+    except Exception as e:
+        if progress_callback:
+            progress_callback(f"❌ Error: {str(e)}")
+        raise e
+
+    if progress_callback:
+        progress_callback(f"✅ Analysis complete for {city_name}!")
+
+    return result
+
+
+def prefetch_search_context(city_name: str, cancelled=None):
+    """
+    Run the standard searches for a city and return their queries and results.
+
+    Cities fully covered by local market data skip the web; their local
+    records stand in as the run's only input.
+
+    Args:
+        city_name: City to search for
+        cancelled: Optional threading.Event; remaining searches are skipped once it is set
+    """
+    if get_market_data().covers(city_name):
+        return [{"query": {"local_market_data": city_name}, "result": as_search_result(city_name)}]
+
+    search_inputs = []
+    for template in SEARCH_QUERIES:
+        if cancelled is not None and cancelled.is_set():
+            break
+        query = template.format(city=city_name)
+        search_inputs.append({
+            "query": {"search_query": query},
+            "result": search_tool.run(search_query=query),
+        })
+    return search_inputs
+
+
+def _normalize_snippet(text) -> str:
+    # Drop leading dates ("Jan 5, 2024 — ", "3 days ago — ") that change without the content changing
+    text = re.sub(r"^(?:\w{3} \d{1,2}, \d{4}|\d+ (?:hours?|days?|weeks?) ago)\s*[—-]\s*", "", str(text))
+    return " ".join(text.split()).lower()
+
+
+def search_fingerprint(search_inputs) -> str:
+    """
+    Hash of the normalized search results behind a run.
+
+    Only the top results' links, titles and snippets count, and their order is
+    ignored, so rank shuffles and volatile metadata don't look like new data.
+    """
+    normalized = []
+    for item in search_inputs:
+        result = item["result"] if isinstance(item["result"], dict) else {}
+        organic = sorted(
+            (o.get("link", ""), _normalize_snippet(o.get("title", "")), _normalize_snippet(o.get("snippet", "")))
+            for o in result.get("organic", [])[:PACKED_RESULTS_PER_QUERY]
+        )
+        query = item["query"].get("search_query") or item["query"].get("local_market_data", "")
+        normalized.append([query.lower().strip(), organic])
+    return content_hash(sorted(normalized))
+
+
+def reuse_if_inputs_unchanged(city_name: str, progress_callback=None):
+    """
+    Cheap refresh: re-run only the searches and reuse the last report if they are unchanged.
+
+    Returns:
+        (report, search_inputs). ``report`` is the last stored report for the
+        city if the fingerprint of today's searches matches the one it was
+        built from, else None. ``search_inputs`` can be passed on to
+        run_property_investment_analysis so the searches aren't repeated.
+    """
+    last_run = store.latest_run(city_name)
+    if not last_run or not last_run.get("input_hash"):
+        return None, None
+
+    if progress_callback:
+        progress_callback(f"🔁 Checking whether {city_name} market data has changed...")
+    started = time.perf_counter()
+    # Results cached up to SEARCH_CACHE_TTL ago could hide changes; only recent
+    # ones (e.g. the prefetch made while the city was typed) are reused
+    with request_scope(timeout=REQUEST_DEADLINE, on_retry=progress_callback), fresh_searches():
+        search_inputs = prefetch_search_context(city_name)
+    input_hash = search_fingerprint(search_inputs)
+    if input_hash != last_run["input_hash"]:
+        return None, search_inputs
+
+    try:
+        report = store.load(last_run["report_hash"]).decode("utf-8")
+        metrics = store.load(last_run["metrics_hash"], as_json=True) if last_run.get("metrics_hash") else None
+    except OSError:
+        return None, search_inputs
+
+    # New index row with a fresh timestamp; the report blob itself is shared, not rewritten
+    timings = {"total": round(time.perf_counter() - started, 4), "reused_run": last_run["run_id"]}
+    store.save_run(city_name, report, search_inputs, timings, metrics=metrics, input_hash=input_hash)
+    return report, search_inputs
+
+
+def format_search_context(search_inputs, max_results: int = PACKED_RESULTS_PER_QUERY) -> str:
+    """Compact search results to title/snippet lines for a prompt."""
+    lines = []
+    for item in search_inputs:
+        label = item["query"].get("search_query") or "local market data"
+        lines.append(f"Query: {label}")
+        result = item["result"] if isinstance(item["result"], dict) else {}
+        for organic in result.get("organic", [])[:max_results]:
+            lines.append(f"- {organic.get('title', '')}: {organic.get('snippet', '')}")
+    return "\n".join(lines)
+
+
+def split_packed_report(text: str, city_names):
+    """
+    Split a packed answer into per-city reports.
+
+    Sections start with "=== CITY: <name> ===" headers; names are matched by
+    canonical city key so "NYC" in the request matches "New York" in the answer.
+    """
+    wanted = {canonical_city_key(city): city for city in city_names}
+    reports = {}
+    parts = re.split(r"^\s*=+\s*CITY:\s*(.+?)\s*=+\s*$", text, flags=re.MULTILINE)
+    # parts = [preamble, name1, body1, name2, body2, ...]
+    for header, body in zip(parts[1::2], parts[2::2]):
+        city = wanted.get(canonical_city_key(header.strip("*# ")))
+        if city and body.strip():
+            reports[city] = body.strip()
+    return reports
+
+
+def _packed_task(cities_with_context):
+    city_list = ", ".join(city for city, _ in cities_with_context)
+    context_blocks = "\n\n".join(
+        f"### Search results for {city}\n{context}" for city, context in cities_with_context
+    )
+    return Task(
+        name=f"packed_analysis_task_{len(cities_with_context)}",
+        description=f"""Analyze retail property investment opportunities in each of these cities: {city_list}.
+Use ONLY the search results provided for each city below.
+
+{context_blocks}
+
+For EACH city, output a section that starts with this exact header line:
+=== CITY: <city name> ===
+
+followed by:
+**Area 1: [Name]**
+Price: $X-$Y | Yield: X%
+Reason: [Brief point]
+
+**Area 2: [Name]**
+Price: $X-$Y | Yield: X%
+Reason: [Brief point]
+
+**Area 3: [Name]**
+Price: $X-$Y | Yield: X%
+Reason: [Brief point]
+
+Keep each city under 400 words. IMPORTANT: Each city's data must come from its own search results only.""",
+        agent=packed_property_analyst,
+        expected_output=f"""One section per city ({city_list}), each with 3 neighborhoods, price ranges, yields, and investment reasons.""",
+    )
+
+
+def run_packed_analysis(city_names, pack_size: int = DEFAULT_PACK_SIZE, progress_callback=None):
+    """
+    Analyze several cities with one LLM request per pack of cities.
+
+    The agent role, backstory and format instructions are sent once per pack
+    instead of once per city, and searches are prefetched instead of being
+    driven by tool-call round-trips. Each city's report is stored as its own
+    run in the artifact store.
+
+    Args:
+        city_names: Cities to analyze; aliases of the same city are analyzed once
+        pack_size: Cities per LLM request, capped at MAX_PACK_SIZE
+        progress_callback: Optional callback function to report progress
+
+    Returns:
+        Dict mapping each requested city name to its report text
+    """
+    # Dedupe aliases ("NYC" / "New York") so a pack never analyzes a city twice
+    unique_cities = {}
+    for city in city_names:
+        unique_cities.setdefault(canonical_city_key(city), city.strip())
+    cities = list(unique_cities.values())
+
+    # A pack whose reports can't all fit in max_tokens would be cut off mid-city
+    if pack_size > MAX_PACK_SIZE:
+        print(f"⚠️ pack_size {pack_size} exceeds the {packed_llm.max_tokens}-token ceiling; using {MAX_PACK_SIZE}")
+    pack_size = max(1, min(pack_size, MAX_PACK_SIZE))
+
+    reports = {}
+    for start in range(0, len(cities), pack_size):
+        pack = cities[start:start + pack_size]
+        if progress_callback:
+            progress_callback(f"📦 Analyzing pack: {', '.join(pack)}...")
+
+        pack_started = time.perf_counter()
+        # Batch class: yields the shared quota to interactive users between calls
+        with scheduler.admit(Priority.BATCH), \
+                request_scope(timeout=REQUEST_DEADLINE, on_retry=progress_callback), \
+                profile_run(f"packed-{'-'.join(pack)}"):
+            search_inputs = {city: prefetch_search_context(city) for city in pack}
+            search_done = time.perf_counter()
+            crew = Crew(
+                agents=[packed_property_analyst],
+                tasks=[_packed_task([(city, format_search_context(search_inputs[city])) for city in pack])],
+                verbose=False,
+                memory=False,
+            )
+            pack_reports = split_packed_report(report_text(crew.kickoff()), pack)
+
+        timings = {
+            "pack_size": len(pack),
+            "searches_total": round(search_done - pack_started, 4),
+            "total": round(time.perf_counter() - pack_started, 4),
+        }
+        for city in pack:
+            if city in pack_reports:
+                reports[city] = pack_reports[city]
+                store.save_run(
+                    city, pack_reports[city], search_inputs[city], timings,
+                    input_hash=search_fingerprint(search_inputs[city]),
+                )
             else:
+                # The model skipped or mangled this city's section; fall back to a single run
                 if progress_callback:
-                    progress_callback(f"❌ Error: {str(e)}")
-                raise e
+                    progress_callback(f"↩️ No packed section for {city}; running it on its own...")
+                reports[city] = report_text(
+                    run_property_investment_analysis(city, progress_callback, priority=Priority.BATCH)
+                )
+
+    # Map results back to every requested spelling, including duplicates
+    return {city: reports[unique_cities[canonical_city_key(city)]] for city in city_names}
@@ -0,0 +1,187 @@
+import os
+import threading
+from collections import Counter
+
+import httpx
+
+# Pool limits; override via env for bigger batch workloads
+MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY", "60"))
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "30"))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# HTTP/2 multiplexes concurrent requests to one host over a single connection;
+# needs the optional h2 package (pip install "httpx[http2]")
+HTTP2 = os.getenv("HTTP_POOL_HTTP2", "1").lower() in ("1", "true", "yes", "on") and _http2_available()
+
+
+class PoolStats:
+    """
+    Request and connection counters for the shared pool.
+
+    ``connections_opened`` counts TCP connects, so ``requests`` minus
+    ``connections_opened`` is the number of requests that reused a
+    kept-alive connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.connections_opened = Counter()
+        self.tls_handshakes = Counter()
+        self.errors = Counter()
+
+    def _trace(self, host: str):
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                self._incr(self.connections_opened, host)
+            elif event_name == "connection.start_tls.complete":
+                self._incr(self.tls_handshakes, host)
+        return trace
+
+    def _incr(self, counter: Counter, host: str):
+        with self._lock:
+            counter[host] += 1
+
+    def on_request(self, request: httpx.Request):
+        host = request.url.host
+        self._incr(self.requests, host)
+        request.extensions["trace"] = self._trace(host)
+
+    def on_response(self, response: httpx.Response):
+        if response.status_code >= 400:
+            self._incr(self.errors, response.request.url.host)
+
+    def snapshot(self):
+        with self._lock:
+            hosts = set(self.requests) | set(self.connections_opened)
+            return {
+                host: {
+                    "requests": self.requests[host],
+                    "connections_opened": self.connections_opened[host],
+                    "reused": max(0, self.requests[host] - self.connections_opened[host]),
+                    "tls_handshakes": self.tls_handshakes[host],
+                    "errors": self.errors[host],
+                }
+                for host in sorted(hosts)
+            }
+
+
+stats = PoolStats()
+_client = None
+_llm_handler = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """
+    Process-wide pooled HTTP client shared by the Serper tool and the LLMs.
+
+    httpx clients are thread-safe, so concurrent sessions and batch runs share
+    one keep-alive pool instead of paying DNS + TCP + TLS on every call.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        with _client_lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(
+                    http2=HTTP2,
+                    timeout=DEFAULT_TIMEOUT,
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                    event_hooks={"request": [stats.on_request], "response": [stats.on_response]},
+                )
+    return _client
+
+
+def llm_http_handler():
+    """litellm HTTP handler backed by the shared pool (pass as ``client=`` to completion)."""
+    from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+    global _llm_handler
+    client = get_client()
+    if _llm_handler is None or _llm_handler.client is not client:
+        _llm_handler = HTTPHandler(client=client)
+    return _llm_handler
+
+
+def pool_stats():
+    """
+    Per-host request/connection counters plus the pool's current connections.
+
+    Returns:
+        {"http2": bool, "limits": {...}, "hosts": {host: {...}}, "open_connections": int}
+    """
+    open_connections = 0
+    if _client is not None and not _client.is_closed:
+        pool = getattr(_client._transport, "_pool", None)
+        open_connections = len(getattr(pool, "connections", ()))
+    return {
+        "http2": HTTP2,
+        "limits": {
+            "max_connections": MAX_CONNECTIONS,
+            "max_keepalive_connections": MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": KEEPALIVE_EXPIRY,
+        },
+        "hosts": stats.snapshot(),
+        "open_connections": open_connections,
+    }
+
+
+def close():
+    """Close the shared client; the next get_client() opens a fresh pool."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+if __name__ == "__main__":
+    # Verify keep-alive against a local stub server: N requests should open 1 connection
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("content-length", 0)))
+            body = json.dumps({"organic": [{"title": "stub", "link": "http://stub", "snippet": "ok"}]}).encode()
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/search"
+
+    print(f"🔌 Stub server at {url} (HTTP/2 {'on' if HTTP2 else 'off'}; plain HTTP uses HTTP/1.1)")
+    for _ in range(20):
+        get_client().post(url, json={"q": "sequential"}).raise_for_status()
+    print(f"Sequential: {pool_stats()['hosts']}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: get_client().post(url, json={"q": "concurrent"}).raise_for_status(), range(80)))
+    print(f"+ 80 concurrent: {pool_stats()}")
+
+    server.shutdown()
+    close()
@@ -0,0 +1,70 @@
+import contextvars
+from crewai import LLM
+from crewai.llms import retry as crewai_retry
+from crewai.types.usage_metrics import UsageMetrics
+from http_pool import llm_http_handler
+from retry_policy import call_with_policy
+from token_budget import budget, count_tokens
+
+# (task budget key, granted max_tokens) for the LLM call in progress
+_current_grant = contextvars.ContextVar("current_grant", default=("default", None))
+# Completion token counts the provider reported during the LLM call in progress
+_call_usage = contextvars.ContextVar("call_usage", default=None)
+
+
+def budget_key(task) -> str:
+    """Name completion lengths are tracked under for a crewAI task."""
+    return getattr(task, "name", None) or "default"
+
+
+class ResilientLLM(LLM):
+    """
+    crewAI LLM whose individual completion calls go through the shared retry policy.
+
+    A rate limit or 5xx on one call is retried on its own instead of
+    re-running the whole crew. ``max_tokens`` acts as a ceiling: each call
+    reserves only what its task has needed so far (see token_budget.py),
+    measured from the provider's reported usage where available.
+    Completions are sent over the shared keep-alive pool in http_pool.py.
+    """
+
+    def call(self, *args, **kwargs):
+        task_name = budget_key(kwargs.get("from_task"))
+        granted = budget.max_tokens_for(task_name, ceiling=self.max_tokens) if self.max_tokens else None
+        token = _current_grant.set((task_name, granted))
+        usage = []
+        usage_token = _call_usage.set(usage)
+        # crewAI's own rate-limit retry would multiply ours; make it pass straight through
+        retry_token = crewai_retry._active_llm_rate_limit_retry.set(True)
+        try:
+            result = call_with_policy("groq", super().call, *args, **kwargs)
+        finally:
+            crewai_retry._active_llm_rate_limit_retry.reset(retry_token)
+            _call_usage.reset(usage_token)
+            _current_grant.reset(token)
+
+        if isinstance(result, str):
+            # The estimate is only a fallback: the truncation check needs real counts
+            completion_tokens = usage[-1] if usage else count_tokens(text=result)
+            budget.record(task_name, completion_tokens, granted=granted)
+        return result
+
+    # Stops BaseLLM.__init_subclass__ wrapping call() in another retry loop
+    call._crewai_rate_limit_wrapped = True
+
+    def _track_token_usage_internal(self, usage_data):
+        super()._track_token_usage_internal(usage_data)
+        # The instance totals are shared by concurrent calls, so keep this call's own count
+        metrics = UsageMetrics.from_provider_dict(usage_data)
+        usage = _call_usage.get()
+        if metrics is not None and usage is not None:
+            usage.append(metrics.completion_tokens)
+
+    def _prepare_completion_params(self, *args, **kwargs):
+        params = super()._prepare_completion_params(*args, **kwargs)
+        params.setdefault("client", llm_http_handler())
+        _, granted = _current_grant.get()
+        if granted:
+            params["max_tokens"] = granted
+            budget.check_prompt(self.model, params["messages"], granted)
+        return params
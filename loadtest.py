@@ -0,0 +1,175 @@
+"""
+Multi-session load test for the Streamlit front ends.
+
+Drives N concurrent AppTest sessions against a stubbed
+``run_property_investment_analysis`` with configurable latency, and reports
+p50/p95/p99 response times, cache hit rate and process RSS as N grows.
+
+Usage:
+    python loadtest.py --app app_cached.py --sessions 1,5,10,25 --requests 10 --latency 2
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import types
+
+# Keep load-test artifacts out of the real artifact store
+os.environ.setdefault("ARTIFACT_DIR", tempfile.mkdtemp(prefix="loadtest-artifacts-"))
+
+from streamlit.testing.v1 import AppTest
+
+DEFAULT_CITIES = ["Berlin", "NYC", "New York", "London", "Tokyo", "Mumbai", "Bombay", "Paris", "Dubai", "Sydney"]
+
+STUB_REPORT = """**Area 1: {city} Central**
+Price: $1,200,000-$1,800,000 | Yield: 5.2%
+Reason: High foot traffic
+
+**Area 2: {city} Riverside**
+Price: $800,000-$1,100,000 | Yield: 6.1%
+Reason: New developments
+
+**Area 3: {city} Old Town**
+Price: $600,000-$900,000 | Yield: 6.8%
+Reason: Tourist footfall"""
+
+
+def install_stub_backend(latency: float, jitter: float):
+    """
+    Replace the crew modules with a stub that sleeps instead of calling Groq/Serper.
+
+    Must run before the app scripts import ``crew`` / ``crew_optimized``.
+    """
+    calls = {"count": 0}
+    lock = threading.Lock()
+
+    def run_property_investment_analysis(city_name, progress_callback=None, search_inputs=None):
+        with lock:
+            calls["count"] += 1
+        time.sleep(max(0.0, random.gauss(latency, jitter)))
+        return STUB_REPORT.format(city=city_name.strip().title())
+
+    for module_name in ("crew", "crew_optimized"):
+        stub = types.ModuleType(module_name)
+        stub.run_property_investment_analysis = run_property_investment_analysis
+        stub.reuse_if_inputs_unchanged = lambda city_name, progress_callback=None: (None, None)
+        stub.prefetch_search_context = lambda city_name, cancelled=None: []
+        sys.modules[module_name] = stub
+    return calls
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def run_session(app_path, cities, num_requests, timeout, seed, results, lock):
+    """Simulate one user: open the app, then run analyses for random cities."""
+    rng = random.Random(seed)
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    at.run()
+
+    for _ in range(num_requests):
+        city = rng.choice(cities)
+        at.text_input[0].input(city)
+        started = time.perf_counter()
+        at.button[0].click().run()
+        elapsed = time.perf_counter() - started
+
+        cache_hit = any("Using cached results" in str(el.value) for el in at.success)
+        errored = len(at.exception) > 0 or len(at.error) > 0
+        with lock:
+            results.append({"latency": elapsed, "cache_hit": cache_hit, "error": errored})
+
+
+def run_level(app_path, num_sessions, num_requests, cities, timeout, seed):
+    results = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(
+            target=run_session,
+            args=(app_path, cities, num_requests, timeout, seed + i, results, lock),
+            daemon=True,
+        )
+        for i in range(num_sessions)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - started
+
+    latencies = [r["latency"] for r in results]
+    return {
+        "sessions": num_sessions,
+        "requests": len(results),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "hit_rate": sum(r["cache_hit"] for r in results) / len(results) if results else 0.0,
+        "errors": sum(r["error"] for r in results),
+        "throughput": len(results) / wall_time if wall_time else 0.0,
+        "rss_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit apps with stubbed backends.")
+    parser.add_argument("--app", default="app_cached.py", help="App script to drive")
+    parser.add_argument("--sessions", default="1,5,10,25", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=10, help="Analyses per session")
+    parser.add_argument("--latency", type=float, default=2.0, help="Stub backend latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Std-dev of stub latency in seconds")
+    parser.add_argument("--cities", default=",".join(DEFAULT_CITIES), help="Comma-separated city pool")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-rerun timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    calls = install_stub_backend(args.latency, args.jitter)
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), args.app)
+    cities = [c.strip() for c in args.cities.split(",") if c.strip()]
+
+    print(f"🏋️ Load testing {args.app} (stub latency {args.latency}s ± {args.jitter}s)")
+    print(f"{'N':>4} {'reqs':>5} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'hit %':>6} {'err':>4} {'req/s':>6} {'RSS MB':>7} {'peak MB':>8} {'backend':>8}")
+    for level in [int(n) for n in args.sessions.split(",")]:
+        backend_calls_before = calls["count"]
+        stats = run_level(app_path, level, args.requests, cities, args.timeout, args.seed)
+        print(
+            f"{stats['sessions']:>4} {stats['requests']:>5} {stats['p50']:>7.2f} {stats['p95']:>7.2f} "
+            f"{stats['p99']:>7.2f} {stats['hit_rate'] * 100:>6.1f} {stats['errors']:>4} "
+            f"{stats['throughput']:>6.2f} {stats['rss_mb']:>7.1f} {stats['peak_rss_mb']:>8.1f} "
+            f"{calls['count'] - backend_calls_before:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
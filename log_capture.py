@@ -0,0 +1,52 @@
+import sys
+import threading
+from contextlib import contextmanager
+from io import StringIO
+
+
+class _ThreadRoutedStdout:
+    """
+    stdout proxy that sends each thread's writes to that thread's capture buffer.
+
+    Swapping ``sys.stdout`` directly is process-wide, so two Streamlit sessions
+    capturing at once would interleave logs and restore each other's buffers.
+    """
+
+    def __init__(self, original):
+        self._original = original
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, "buffer", None) or self._original
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._original, name)
+
+
+_install_lock = threading.Lock()
+
+
+def _routed_stdout() -> _ThreadRoutedStdout:
+    with _install_lock:
+        if not isinstance(sys.stdout, _ThreadRoutedStdout):
+            sys.stdout = _ThreadRoutedStdout(sys.stdout)
+        return sys.stdout
+
+
+@contextmanager
+def capture_stdout():
+    """Capture stdout written by the current thread into a StringIO."""
+    routed = _routed_stdout()
+    buffer = StringIO()
+    previous = getattr(routed._local, "buffer", None)
+    routed._local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        routed._local.buffer = previous
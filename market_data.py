@@ -0,0 +1,168 @@
+import csv
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+
+from city_index import canonical_city_key, normalize_city
+
+# Our own neighborhood price/yield data (listings exports, past reports);
+# CSV by default, Parquet if the path ends in .parquet (needs pandas + pyarrow)
+MARKET_DATA_PATH = os.getenv(
+    "MARKET_DATA_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "market_data.csv"),
+)
+
+# Neighborhoods a city needs locally before the web search can be skipped
+FULL_COVERAGE_AREAS = 3
+
+
+@dataclass(frozen=True)
+class MarketRecord:
+    """Price and yield data for one neighborhood."""
+    city: str
+    neighborhood: str
+    price_low: float
+    price_high: float
+    currency: str
+    rental_yield: float
+    highlights: str = ""
+    source: str = ""
+    as_of: str = ""
+
+    def describe(self) -> str:
+        return (
+            f"{self.neighborhood}: Price {self.currency}{self.price_low:,.0f}-{self.currency}{self.price_high:,.0f}"
+            f" | Yield: {self.rental_yield:g}% | {self.highlights}"
+        )
+
+
+def _read_rows(path: str):
+    if path.endswith(".parquet"):
+        import pandas as pd
+
+        return pd.read_parquet(path).to_dict("records")
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+class MarketDataIndex:
+    """
+    In-memory index of local market data keyed by city and neighborhood.
+
+    Cities are keyed by canonical city key, so "Bombay" finds rows stored
+    under "Mumbai". Each city's neighborhoods are kept sorted by yield.
+    """
+
+    def __init__(self, records):
+        self._by_city = defaultdict(list)
+        self._by_area = {}
+        for record in records:
+            city_key = canonical_city_key(record.city)
+            self._by_city[city_key].append(record)
+            self._by_area[(city_key, normalize_city(record.neighborhood))] = record
+        for city_records in self._by_city.values():
+            city_records.sort(key=lambda r: r.rental_yield, reverse=True)
+
+    @classmethod
+    def from_file(cls, path: str = MARKET_DATA_PATH):
+        records = []
+        for row in _read_rows(path):
+            try:
+                records.append(MarketRecord(
+                    city=str(row["city"]).strip(),
+                    neighborhood=str(row["neighborhood"]).strip(),
+                    price_low=float(row["price_low"]),
+                    price_high=float(row["price_high"]),
+                    currency=str(row.get("currency") or "$").strip(),
+                    rental_yield=float(row["rental_yield"]),
+                    highlights=str(row.get("highlights") or "").strip(),
+                    source=str(row.get("source") or "").strip(),
+                    as_of=str(row.get("as_of") or "").strip(),
+                ))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"⚠️ Skipping malformed market data row {row}: {e}")
+        return cls(records)
+
+    def lookup(self, city: str, neighborhood: str = None):
+        """Records for a city (best yield first), or just the named neighborhood."""
+        city_key = canonical_city_key(city)
+        if neighborhood:
+            record = self._by_area.get((city_key, normalize_city(neighborhood)))
+            return [record] if record else []
+        return list(self._by_city.get(city_key, ()))
+
+    def covers(self, city: str) -> bool:
+        """Whether there is enough local data to report on ``city`` without a web search."""
+        return len(self._by_city.get(canonical_city_key(city), ())) >= FULL_COVERAGE_AREAS
+
+    def __len__(self):
+        return len(self._by_area)
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_market_data() -> MarketDataIndex:
+    """Shared index, reloaded when the data file changes on disk."""
+    global _index, _index_mtime
+    try:
+        mtime = os.stat(MARKET_DATA_PATH).st_mtime
+    except OSError:
+        mtime = None
+    if _index is None or mtime != _index_mtime:
+        with _index_lock:
+            if _index is None or mtime != _index_mtime:
+                _index = MarketDataIndex.from_file() if mtime is not None else MarketDataIndex([])
+                _index_mtime = mtime
+    return _index
+
+
+def format_market_data(place: str, records, whole_city: bool = True) -> str:
+    """
+    Tool answer for local records, including what is still missing.
+
+    Args:
+        place: City (or "neighborhood, city") that was looked up
+        records: Matching MarketRecords
+        whole_city: Whether the lookup was for a whole city, so coverage gaps are reported
+    """
+    if not records:
+        return f"No local market data for {place}. Use the web search tool."
+    lines = [f"Local market data for {place}:"]
+    lines += [f"- {record.describe()} (source: {record.source or 'local'}, as of {record.as_of or 'unknown'})" for record in records]
+    missing = FULL_COVERAGE_AREAS - len(records)
+    if whole_city and missing > 0:
+        lines.append(f"Only {len(records)} neighborhood(s) covered locally; use web search for {missing} more.")
+    elif whole_city:
+        lines.append("Local data covers this city; no web search needed.")
+    return "\n".join(lines)
+
+
+def as_search_result(city: str):
+    """Local records for ``city`` shaped like a Serper result, for prompts and input fingerprints."""
+    return {
+        "organic": [
+            {
+                "title": record.neighborhood,
+                "link": f"local://{canonical_city_key(city)}/{normalize_city(record.neighborhood)}",
+                "snippet": record.describe(),
+            }
+            for record in get_market_data().lookup(city)
+        ]
+    }
+
+
+if __name__ == "__main__":
+    import time
+
+    index = get_market_data()
+    print(f"📚 {len(index)} neighborhoods loaded from {MARKET_DATA_PATH}")
+    for query in ("Indore", "indore, mp", "Berlin"):
+        started = time.perf_counter()
+        for _ in range(10000):
+            records = index.lookup(query)
+        per_lookup_us = (time.perf_counter() - started) / 10000 * 1e6
+        print(f"{query!r}: {len(records)} records, covers={index.covers(query)}, {per_lookup_us:.1f} µs/lookup")
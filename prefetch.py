@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from city_index import canonicalize_city
+from retry_policy import request_scope
+from scheduler import Priority, scheduler
+from tools import FRESH_SEARCH_MAX_AGE
+
+# Rate limits so typing through several cities doesn't burn the search quota
+PREFETCH_MAX_PER_MINUTE = int(os.getenv("PREFETCH_MAX_PER_MINUTE", "10"))  # Across all sessions
+PREFETCH_MIN_INTERVAL = float(os.getenv("PREFETCH_MIN_INTERVAL", "2.0"))  # Per session, seconds
+# A finished prefetch counts as fresh for as long as the unchanged-inputs
+# check (crew_optimized.reuse_if_inputs_unchanged) accepts its cached results
+PREFETCH_TTL = FRESH_SEARCH_MAX_AGE
+PREFETCH_TIMEOUT = 30
+# Longest an interactive run waits on a (batch-priority) prefetch before doing its own searches
+PREFETCH_JOIN_TIMEOUT = float(os.getenv("PREFETCH_JOIN_TIMEOUT", "5"))
+PREFETCH_WORKERS = 2
+
+
+class PrefetchJob:
+    """One city's speculative prefetch, shared by every session that asked for it."""
+
+    def __init__(self, city_id: str, city_name: str):
+        self.city_id = city_id
+        self.city_name = city_name
+        self.owners = set()
+        self.cancelled = threading.Event()
+        self.started_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self.future = None
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None and self.error is None and not self.cancelled.is_set()
+
+
+class SpeculativePrefetcher:
+    """
+    Warms the search cache for a city while the user is still on the input.
+
+    Only cities that canonicalize against the gazetteer are prefetched.
+    Each session has at most one prefetch: moving on to another city cancels
+    the previous one (queued jobs are dropped, running ones stop before their
+    next search) unless another session still wants it. Prefetch calls run
+    at batch priority, so they never take quota from interactive analyses.
+
+    Args:
+        job: Callable ``job(city_name, cancelled)`` doing the actual warm-up,
+            e.g. crew_optimized.prefetch_search_context
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._by_owner = {}
+        self._owner_last_start = {}
+        self._recent_starts = deque()
+
+    def prefetch(self, city_name: str, owner: str):
+        """
+        Start (or join) a prefetch for ``city_name`` on behalf of session ``owner``.
+
+        Returns:
+            The PrefetchJob, or None if the city isn't recognised or the rate limit was hit
+        """
+        match = canonicalize_city(city_name)
+        with self._lock:
+            previous = self._by_owner.get(owner)
+            if previous is not None and (match is None or previous != match.id):
+                self._release(owner, previous)
+            if match is None:
+                return None
+
+            job = self._jobs.get(match.id)
+            if job is not None and not self._expired(job):
+                job.owners.add(owner)
+                self._by_owner[owner] = match.id
+                return job
+
+            now = time.time()
+            while self._recent_starts and now - self._recent_starts[0] > 60:
+                self._recent_starts.popleft()
+            if (len(self._recent_starts) >= PREFETCH_MAX_PER_MINUTE
+                    or now - self._owner_last_start.get(owner, 0.0) < PREFETCH_MIN_INTERVAL):
+                return None
+
+            job = PrefetchJob(match.id, city_name.strip())
+            job.owners.add(owner)
+            self._jobs[match.id] = job
+            self._by_owner[owner] = match.id
+            self._owner_last_start[owner] = now
+            self._recent_starts.append(now)
+            job.future = self._executor.submit(self._run, job)
+            return job
+
+    def status(self, city_name: str):
+        """The current prefetch job for ``city_name``, if any."""
+        match = canonicalize_city(city_name)
+        with self._lock:
+            return self._jobs.get(match.id) if match else None
+
+    def wait(self, city_name: str, owner: str = None, timeout: float = PREFETCH_JOIN_TIMEOUT) -> bool:
+        """
+        Wait briefly for an in-flight prefetch of ``city_name`` instead of repeating its searches.
+
+        Prefetches run at batch priority, so an interactive caller only waits
+        ``timeout`` seconds. After that ``owner``'s interest is dropped (the job
+        is cancelled unless another session still wants it) and the caller
+        should run the searches itself at its own priority.
+
+        Returns:
+            True if the city's search context is now warm
+        """
+        job = self.status(city_name)
+        if job is None:
+            return False
+        try:
+            job.future.result(timeout=timeout)
+        except (CancelledError, FutureTimeoutError):
+            if owner is not None:
+                self.cancel(owner)
+            return False
+        return job.ready
+
+    def cancel(self, owner: str):
+        """Drop ``owner``'s interest in its current prefetch."""
+        with self._lock:
+            previous = self._by_owner.get(owner)
+            if previous is not None:
+                self._release(owner, previous)
+
+    def _expired(self, job: PrefetchJob) -> bool:
+        if job.cancelled.is_set() or job.error is not None:
+            return True
+        return job.finished_at is not None and time.time() - job.finished_at > PREFETCH_TTL
+
+    def _release(self, owner: str, city_id: str):
+        # Caller holds self._lock
+        self._by_owner.pop(owner, None)
+        job = self._jobs.get(city_id)
+        if job is None:
+            return
+        job.owners.discard(owner)
+        if not job.owners and job.finished_at is None:
+            job.cancelled.set()
+            job.future.cancel()
+            del self._jobs[city_id]
+
+    def _run(self, job: PrefetchJob):
+        if job.cancelled.is_set():
+            return
+        try:
+            with scheduler.priority_scope(Priority.BATCH), \
+                    request_scope(timeout=PREFETCH_TIMEOUT, on_retry=lambda message: None):
+                self.job(job.city_name, job.cancelled)
+        except Exception as e:
+            # Speculative: a failed prefetch just means the real run does the searches
+            job.error = e
+        finally:
+            job.finished_at = time.time()
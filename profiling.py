@@ -0,0 +1,178 @@
+import contextvars
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_ENV = "PROPERTY_BOT_PROFILE"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))  # 5 ms
+TRACEMALLOC_FRAMES = 25
+
+
+def profiling_enabled() -> bool:
+    """Whether profiling is switched on via the PROPERTY_BOT_PROFILE env var."""
+    return os.getenv(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval.
+
+    Stacks are aggregated in collapsed ("folded") format, which flamegraph.pl,
+    speedscope and inferno read directly.
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                frames.append(f"{module}:{code.co_name}")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileResult:
+    """Paths of the files written for one profiled run."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.pstats_path = None
+        self.folded_path = None
+        self.tracemalloc_path = None
+        self.allocations_path = None
+        self.duration = None
+
+
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+def _start_tracemalloc() -> bool:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            return False  # Someone else owns tracing; leave it alone
+        if _tracemalloc_users == 0:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        _tracemalloc_users += 1
+        return True
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+def _write_allocation_report(before, after, path: str, limit: int = 30):
+    with open(path, "w") as f:
+        f.write("Top allocations by size growth during the run\n\n")
+        for stat in after.compare_to(before, "traceback")[:limit]:
+            f.write(f"{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks)\n")
+            for line in stat.traceback.format()[-6:]:
+                f.write(f"    {line}\n")
+            f.write("\n")
+
+
+@contextmanager
+def profile_run(label: str, enabled: bool = None):
+    """
+    Profile the enclosed block and save the results under PROFILE_DIR.
+
+    Writes a cProfile ``.prof`` file, a collapsed-stack ``.folded`` file for
+    flamegraphs, a tracemalloc snapshot and a top-allocations report. Nested
+    calls inside an active profile are no-ops.
+
+    Args:
+        label: Name used in the output file names, e.g. "analysis-Berlin"
+        enabled: Force profiling on/off for the block, including profile_run
+            calls nested in it; None falls back to the env var
+    """
+    if _active_profile.get() is not None:
+        yield None
+        return
+    if enabled is False:
+        # Switched off explicitly (e.g. the sidebar toggle): keep nested runs off too
+        token = _active_profile.set(False)
+        try:
+            yield None
+        finally:
+            _active_profile.reset(token)
+        return
+    if not (enabled or profiling_enabled()):
+        yield None
+        return
+
+    result = ProfileResult(label)
+    token = _active_profile.set(result)
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label)
+    base = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_label}")
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        profiler = None  # Another profiler is active (Python 3.12+ allows only one)
+    sampler = StackSampler(threading.get_ident())
+    sampler.start()
+    tracing = _start_tracemalloc()
+    snapshot_before = tracemalloc.take_snapshot() if tracing else None
+    started = time.perf_counter()
+
+    try:
+        yield result
+    finally:
+        result.duration = time.perf_counter() - started
+        if profiler is not None:
+            profiler.disable()
+        sampler.stop()
+        # Snapshot before writing any output so the report only shows the run's allocations
+        snapshot_after = tracemalloc.take_snapshot() if tracing else None
+
+        if profiler is not None:
+            result.pstats_path = f"{base}.prof"
+            profiler.dump_stats(result.pstats_path)
+        result.folded_path = f"{base}.folded"
+        sampler.write_folded(result.folded_path)
+        if tracing:
+            _stop_tracemalloc()
+            result.tracemalloc_path = f"{base}.tracemalloc"
+            snapshot_after.dump(result.tracemalloc_path)
+            result.allocations_path = f"{base}-allocations.txt"
+            _write_allocation_report(snapshot_before, snapshot_after, result.allocations_path)
+
+        _active_profile.reset(token)
+        print(f"🧪 Profile for {label} ({result.duration:.1f}s) saved to {base}.*")
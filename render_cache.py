@@ -0,0 +1,72 @@
+import hashlib
+import altair as alt
+import streamlit as st
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of a report's text, used as the render memo key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_price_chart_spec(df):
+    """Build the Vega-Lite spec for the neighborhood price bar chart."""
+    price_chart = (
+        alt.Chart(df)
+        .mark_bar(color="#1f77b4", size=40)
+        .encode(
+            x=alt.X("Neighborhood:N", title="Neighborhood", sort="-y"),
+            y=alt.Y("Avg Price ($):Q", title="Average Price ($)"),
+            tooltip=["Neighborhood", "Avg Price ($)", "Rental Yield (%)"]
+        )
+        .properties(height=300)
+    )
+    return price_chart.to_dict()
+
+
+def format_display_df(df):
+    """Format price and yield columns for the metrics table."""
+    display_df = df.copy()
+    display_df["Avg Price ($)"] = df["Avg Price ($)"].map("${:,.0f}".format)
+    display_df["Rental Yield (%)"] = df["Rental Yield (%)"].map("{:.1f}%".format)
+    return display_df
+
+
+# Underscore-prefixed arguments are skipped by Streamlit's hasher, so the
+# memo is keyed only on the content hash and the parser's name.
+@st.cache_data(show_spinner=False, max_entries=256)
+def _build_report_view(text_hash: str, parser_name: str, _text: str, _parser):
+    metrics, neighborhoods, df = _parser(_text)
+
+    has_chart_data = df is not None and not df.empty
+    return {
+        "metrics": metrics,
+        "neighborhoods": neighborhoods,
+        "df": df,
+        "display_df": format_display_df(df) if has_chart_data else None,
+        "chart_spec": build_price_chart_spec(df) if has_chart_data else None,
+    }
+
+
+def get_report_view(text: str, parser):
+    """
+    Parse a report and prepare everything needed to render it, memoized across reruns.
+
+    Args:
+        text: Raw report text returned by the crew
+        parser: The app's ``extract_metrics_from_text`` function
+
+    Returns:
+        Dict with ``metrics``, ``neighborhoods``, ``df``, ``display_df`` and ``chart_spec``
+    """
+    parser_name = f"{parser.__module__}.{parser.__qualname__}"
+    return _build_report_view(content_hash(text), parser_name, text, parser)
+
+
+def parsed_metrics(view) -> dict:
+    """JSON-serialisable form of a report view, for the artifact store."""
+    df = view["df"]
+    return {
+        "metrics": view["metrics"],
+        "neighborhoods": view["neighborhoods"],
+        "rows": df.to_dict("records") if df is not None else [],
+    }
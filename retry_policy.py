@@ -0,0 +1,267 @@
+import contextvars
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum
+from scheduler import scheduler
+
+
+class ErrorKind(Enum):
+    """Failure classes the retry policy distinguishes between."""
+    RATE_LIMIT = "rate_limit"
+    TIMEOUT = "timeout"
+    SERVER_ERROR = "server_error"
+    TOOL_FAILURE = "tool_failure"
+    FATAL = "fatal"
+
+
+RETRYABLE_KINDS = {
+    ErrorKind.RATE_LIMIT,
+    ErrorKind.TIMEOUT,
+    ErrorKind.SERVER_ERROR,
+    ErrorKind.TOOL_FAILURE,
+}
+
+# Only these count against an upstream's circuit breaker; a rate limit means
+# the service is healthy but busy, which the backoff already handles.
+BREAKER_KINDS = {ErrorKind.TIMEOUT, ErrorKind.SERVER_ERROR}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when an upstream's circuit breaker is open."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a request's overall deadline would be exceeded."""
+
+
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(exc: BaseException, is_tool: bool = False) -> ErrorKind:
+    """
+    Map an exception raised by an LLM or tool call to an ErrorKind.
+
+    Args:
+        exc: The exception raised by the call
+        is_tool: Whether the call was a tool call; unrecognised tool errors
+            are treated as retryable tool failures instead of fatal
+    """
+    status = _status_code(exc)
+    name = type(exc).__name__.lower()
+    msg = str(exc).lower()
+
+    if status == 429 or "ratelimit" in name or "rate_limit" in msg or "rate limit" in msg:
+        return ErrorKind.RATE_LIMIT
+    if isinstance(exc, TimeoutError) or "timeout" in name or "timed out" in msg:
+        return ErrorKind.TIMEOUT
+    if (status is not None and 500 <= status < 600) or any(
+        marker in name for marker in ("internalserver", "serviceunavailable", "apiconnection")
+    ) or isinstance(exc, ConnectionError):
+        return ErrorKind.SERVER_ERROR
+    if is_tool:
+        return ErrorKind.TOOL_FAILURE
+    return ErrorKind.FATAL
+
+
+def retry_after_hint(exc: BaseException):
+    """Return the server-suggested wait in seconds, if the error carries one."""
+    wait_match = re.search(r'try again in ([\d.]+)s', str(exc))
+    if wait_match:
+        return float(wait_match.group(1))
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Backoff settings for one upstream."""
+    max_attempts: int = 3
+    base_delay: float = 2.0
+    max_delay: float = 120.0
+    jitter: float = 0.5  # Fraction of the delay that is randomised
+    hint_buffer: float = 5.0  # Added to server-suggested waits
+
+    def compute_delay(self, attempt: int, exc: BaseException) -> float:
+        """Delay before retry number ``attempt + 1`` (attempt is 0-based)."""
+        hint = retry_after_hint(exc)
+        if hint is not None:
+            return min(self.max_delay, hint + self.hint_buffer)
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(delay * (1 - self.jitter), delay)
+
+
+class CircuitBreaker:
+    """
+    Per-upstream circuit breaker.
+
+    Opens after ``failure_threshold`` consecutive failures, rejects calls for
+    ``reset_timeout`` seconds, then lets a single trial call through.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """End an allowed call that says nothing about the upstream's health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+DEFAULT_POLICIES = {
+    "groq": RetryPolicy(max_attempts=4, base_delay=10.0, max_delay=120.0),
+    "serper": RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=10.0),
+}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker for an upstream."""
+    with _breakers_lock:
+        if upstream not in _breakers:
+            _breakers[upstream] = CircuitBreaker()
+        return _breakers[upstream]
+
+
+class RequestScope:
+    """Deadline and retry notifications for one analysis request."""
+
+    def __init__(self, timeout=None, on_retry=None):
+        self.expires_at = time.monotonic() + timeout if timeout else None
+        self.on_retry = on_retry
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def notify(self, message: str):
+        if self.on_retry:
+            self.on_retry(message)
+        else:
+            print(message)
+
+
+_current_scope = contextvars.ContextVar("request_scope", default=None)
+
+
+@contextmanager
+def request_scope(timeout=None, on_retry=None):
+    """
+    Bound every policy-wrapped call made inside the block by one deadline.
+
+    Args:
+        timeout: Overall budget for the request in seconds (None for no limit)
+        on_retry: Optional callback receiving a message before each retry wait
+    """
+    token = _current_scope.set(RequestScope(timeout, on_retry))
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+
+
+def call_with_policy(upstream: str, fn, *args, policy=None, is_tool=False, **kwargs):
+    """
+    Call ``fn`` with retries, backoff and circuit breaking for ``upstream``.
+
+    Only the failing call is retried, so a late failure doesn't rerun the
+    work that already succeeded.
+    """
+    policy = policy or DEFAULT_POLICIES.get(upstream, RetryPolicy())
+    breaker = get_breaker(upstream)
+    scope = _current_scope.get() or RequestScope()
+
+    for attempt in range(policy.max_attempts):
+        remaining = scope.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceededError(f"Request deadline exceeded before calling {upstream}")
+        # Breaker first, so calls it rejects don't use up quota
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {upstream}; skipping call")
+        # Shared quota: interactive calls go first, batch calls use what's left
+        if not scheduler.acquire_call(upstream, timeout=remaining, notify=scope.notify):
+            breaker.release()
+            raise DeadlineExceededError(f"Request deadline exceeded waiting for {upstream} quota")
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            kind = classify_error(exc, is_tool=is_tool)
+            if kind in BREAKER_KINDS:
+                breaker.record_failure()
+            elif kind is ErrorKind.RATE_LIMIT:
+                breaker.record_success()
+            else:
+                # Bad requests and unknown tool errors don't show whether the upstream is up
+                breaker.release()
+
+            if kind not in RETRYABLE_KINDS or attempt == policy.max_attempts - 1:
+                raise
+
+            wait_time = policy.compute_delay(attempt, exc)
+            if kind is ErrorKind.RATE_LIMIT:
+                # Hold everyone's calls to this upstream, not just this retry
+                scheduler.pause(upstream, wait_time)
+            remaining = scope.remaining()
+            if remaining is not None and wait_time >= remaining:
+                raise DeadlineExceededError(
+                    f"Request deadline exceeded waiting to retry {upstream}: {exc}"
+                ) from exc
+
+            scope.notify(
+                f"⏳ {kind.value.replace('_', ' ').capitalize()} from {upstream}. "
+                f"Waiting {int(wait_time)}s before retry {attempt + 2}/{policy.max_attempts}..."
+            )
+            time.sleep(wait_time)
+        else:
+            breaker.record_success()
+            return result
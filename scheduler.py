@@ -0,0 +1,227 @@
+import contextvars
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from enum import Enum
+
+
+class Priority(Enum):
+    """Scheduling classes; interactive requests always go first."""
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+
+# Analyses allowed to run at once per class
+CONCURRENCY_LIMITS = {
+    Priority.INTERACTIVE: int(os.getenv("SCHED_INTERACTIVE_CONCURRENCY", "8")),
+    Priority.BATCH: int(os.getenv("SCHED_BATCH_CONCURRENCY", "2")),
+}
+
+# Shared per-upstream quota in calls per minute (Groq free tier allows 30 requests/min)
+UPSTREAM_RATES = {
+    "groq": float(os.getenv("SCHED_GROQ_RPM", "30")),
+    "serper": float(os.getenv("SCHED_SERPER_RPM", "300")),
+}
+DEFAULT_RATE = 60.0
+
+# Share of each upstream's quota that batch work may not touch
+INTERACTIVE_RESERVE = float(os.getenv("SCHED_INTERACTIVE_RESERVE", "0.3"))
+
+# How often a deferred batch call re-checks whether interactive work is still waiting
+BATCH_POLL_INTERVAL = 0.5
+
+_current_priority = contextvars.ContextVar("priority", default=None)
+
+
+def current_priority() -> Priority:
+    """Priority of the analysis running in this context (interactive outside any)."""
+    return _current_priority.get() or Priority.INTERACTIVE
+
+
+class QuotaBucket:
+    """Token bucket holding one upstream's per-minute call quota."""
+
+    def __init__(self, per_minute: float, reserve: float = INTERACTIVE_RESERVE):
+        self.capacity = max(1.0, per_minute)
+        self.refill_rate = self.capacity / 60.0
+        self.reserve = self.capacity * reserve
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def wait_time(self, now: float, floor: float) -> float:
+        """Seconds until a call can be taken without dropping below ``floor`` tokens."""
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        needed = floor + 1 - self.tokens
+        return 0.0 if needed <= 0 else needed / self.refill_rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Scheduler:
+    """
+    Admission control and quota sharing between interactive and batch analyses.
+
+    Each class has its own concurrency cap. Every Groq/Serper call passes
+    through ``acquire_call``: interactive calls may use the whole quota,
+    batch calls only what is left above the interactive reserve, and batch
+    calls wait while any interactive call is queued for the same upstream.
+    Batch analyses are therefore preempted at their next call boundary
+    and resume on leftover capacity.
+    """
+
+    def __init__(self, limits=None, rates=None):
+        self.limits = dict(limits or CONCURRENCY_LIMITS)
+        self.rates = dict(rates or UPSTREAM_RATES)
+        self._slots = {priority: threading.BoundedSemaphore(limit) for priority, limit in self.limits.items()}
+        self._cond = threading.Condition()
+        self._buckets = {}
+        self._active = Counter()
+        self._queued = Counter()
+        self._interactive_waiting = Counter()
+        self._deferred_calls = Counter()
+
+    def _bucket(self, upstream: str) -> QuotaBucket:
+        if upstream not in self._buckets:
+            self._buckets[upstream] = QuotaBucket(self.rates.get(upstream, DEFAULT_RATE))
+        return self._buckets[upstream]
+
+    @contextmanager
+    def admit(self, priority: Priority = Priority.INTERACTIVE):
+        """
+        Run the enclosed analysis as ``priority``, waiting for a slot in its class.
+
+        Nested admissions (e.g. a batch job falling back to a single-city run)
+        reuse the outer slot and priority.
+        """
+        if _current_priority.get() is not None:
+            yield
+            return
+
+        with self._cond:
+            self._queued[priority] += 1
+        self._slots[priority].acquire()
+        with self._cond:
+            self._queued[priority] -= 1
+            self._active[priority] += 1
+        token = _current_priority.set(priority)
+        try:
+            yield
+        finally:
+            _current_priority.reset(token)
+            with self._cond:
+                self._active[priority] -= 1
+            self._slots[priority].release()
+
+    @contextmanager
+    def priority_scope(self, priority: Priority):
+        """
+        Draw calls made in the block from ``priority``'s share without taking a slot.
+
+        For short background work (e.g. speculative prefetches) that should
+        yield to interactive users but not queue behind batch jobs.
+        """
+        token = _current_priority.set(priority)
+        try:
+            yield
+        finally:
+            _current_priority.reset(token)
+
+    def acquire_call(self, upstream: str, timeout: float = None, notify=None) -> bool:
+        """
+        Take one call from ``upstream``'s quota for the current priority.
+
+        Args:
+            upstream: Quota to draw from, e.g. "groq"
+            timeout: Longest to wait in seconds (None waits as long as needed)
+            notify: Optional callback receiving a message if the call has to wait
+
+        Returns:
+            False if the quota couldn't be had within ``timeout``
+        """
+        priority = current_priority()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        message = None
+
+        with self._cond:
+            bucket = self._bucket(upstream)
+            floor = bucket.reserve if priority is Priority.BATCH else 0.0
+            if priority is Priority.INTERACTIVE:
+                self._interactive_waiting[upstream] += 1
+        try:
+            while True:
+                # Callbacks run outside the lock; they may be slow (e.g. a Streamlit update)
+                if message:
+                    notify(message)
+                    message = None
+                with self._cond:
+                    now = time.monotonic()
+                    yield_to_interactive = priority is Priority.BATCH and self._interactive_waiting[upstream] > 0
+                    wait = BATCH_POLL_INTERVAL if yield_to_interactive else bucket.wait_time(now, floor)
+                    if wait <= 0:
+                        bucket.take()
+                        return True
+
+                    remaining = None if deadline is None else deadline - now
+                    if remaining is not None and (remaining <= 0 or (not yield_to_interactive and wait > remaining)):
+                        return False
+                    if not waited:
+                        waited = True
+                        if priority is Priority.BATCH:
+                            self._deferred_calls[upstream] += 1
+                        if notify and wait >= 1:
+                            message = f"🚦 Waiting {int(wait)}s for {upstream} quota ({priority.value})..."
+                            continue
+                    self._cond.wait(wait if remaining is None else min(wait, remaining))
+        finally:
+            if priority is Priority.INTERACTIVE:
+                with self._cond:
+                    self._interactive_waiting[upstream] -= 1
+                    self._cond.notify_all()
+
+    def pause(self, upstream: str, seconds: float):
+        """Hold all calls to ``upstream`` for ``seconds``, e.g. after it returned a rate limit."""
+        with self._cond:
+            bucket = self._bucket(upstream)
+            bucket.paused_until = max(bucket.paused_until, time.monotonic() + seconds)
+
+    def stats(self):
+        """Current per-class and per-upstream state, for inspection."""
+        with self._cond:
+            now = time.monotonic()
+            upstreams = {}
+            for upstream in sorted(set(self.rates) | set(self._buckets)):
+                bucket = self._bucket(upstream)
+                bucket.wait_time(now, 0.0)  # Refill before reporting
+                upstreams[upstream] = {
+                    "tokens": round(bucket.tokens, 1),
+                    "per_minute": bucket.capacity,
+                    "interactive_reserve": round(bucket.reserve, 1),
+                    "interactive_waiting": self._interactive_waiting[upstream],
+                    "batch_deferrals": self._deferred_calls[upstream],
+                    "paused_for": round(max(0.0, bucket.paused_until - now), 1),
+                }
+            return {
+                "classes": {
+                    priority.value: {
+                        "active": self._active[priority],
+                        "queued": self._queued[priority],
+                        "limit": self.limits[priority],
+                    }
+                    for priority in Priority
+                },
+                "upstreams": upstreams,
+            }
+
+
+scheduler = Scheduler()
@@ -2,9 +2,11 @@ from crewai import Task
 from agents import property_researcher, property_analyst
 
 research_task = Task(
-    description="""Research retail property investment opportunities in the specified city using the search tool.
+    name="research_task",
+    description="""Research retail property investment opportunities in the specified city.
 
-    YOU MUST use the search tool with queries like:
+    FIRST check the local market data tool for the city. If it covers the city, use its figures.
+    Otherwise use the search tool for the missing neighborhoods, with queries like:
     - "best neighborhoods for retail investment in [CITY]"
     - "retail property prices [CITY]"
     - "commercial real estate rental yields [CITY]"
@@ -16,7 +18,7 @@ research_task = Task(
     4. **Specific reasons** why each area is good for retail (foot traffic, demographics, new developments)
 
     IMPORTANT: 
-    - Use REAL data from your searches, not generic information
+    - Use REAL data from the local market data or your searches, not generic information
     - Include specific neighborhood/district names
     - Provide different data for different cities
     - Format prices with currency symbols ($, €, £, etc.)
@@ -43,6 +45,7 @@ research_task = Task(
 
 
 analysis_task = Task(
+    name="analysis_task",
     description="""Summarize the research findings into a clear investment report.
     
     Format the output to clearly show:
@@ -61,11 +64,11 @@ analysis_task = Task(
     expected_output="""Formatted summary with clear sections for each of the 3 neighborhoods, 
     including area names, price ranges, rental yields, and investment highlights.""",
     agent=property_analyst,
-    output_file="task2_output.txt",
 )
 
 
 old_research_task = Task(
+    name="old_research_task",
     description="""Search the internet and find 5 promising real estate investment cities in Germany. 
     For each city highlighting the mean, low and max prices as well as the rental yield and any potential 
     factors that would be useful to know for that area.""",
@@ -80,5 +83,4 @@ old_research_task = Task(
     employment centers, and educational institutions. 
     The following list highlights some of the top contenders for investment opportunities """,
     agent=property_researcher,
-    output_file="research_task_output_internet.txt"
 )
@@ -3,9 +3,11 @@ from agents_optimized import property_analyst
 
 # Single combined task instead of two separate tasks
 analysis_task = Task(
-    description="""Search for retail property investment opportunities in {city}.
+    name="optimized_analysis_task",
+    description="""Find retail property investment opportunities in {city}.
 
-Search queries to use:
+First look up {city} with the local market data tool. If it covers the city, use its data and skip web search.
+Otherwise search the web for the neighborhoods it doesn't cover, using:
 1. "retail property investment {city} best areas"
 2. "commercial real estate prices {city}"
 
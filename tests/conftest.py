@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Modules live at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importable without real credentials or network access
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+os.environ.setdefault("SERPER_API_KEY", "test-key")
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
@@ -0,0 +1,51 @@
+import time
+
+import artifact_store
+from artifact_store import ArtifactStore
+
+
+def test_load_returns_raw_bytes_unless_json_requested(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.save_run("Berlin", "**Area 1: Mitte**", timings={"total": 1.5})
+    assert store.flush()
+
+    run = store.latest_run("Berlin")
+    assert store.load(run["report_hash"]) == b"**Area 1: Mitte**"
+    assert store.load(run["timings_hash"], as_json=True) == {"total": 1.5}
+
+
+def test_flush_does_not_hang_when_writer_dies(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    store = ArtifactStore(str(blocker / "artifacts"))  # Writer setup fails: parent is a file
+    store.save_run("Berlin", "report")
+
+    started = time.monotonic()
+    assert store.flush(timeout=5) is False
+    assert time.monotonic() - started < 5
+
+
+def unavailable_store(tmp_path, **kwargs):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    return ArtifactStore(str(blocker / "artifacts"), **kwargs)
+
+
+def test_full_queue_drops_writes_instead_of_growing(tmp_path, capsys):
+    store = unavailable_store(tmp_path, queue_size=2)
+    for _ in range(3):
+        store.save_run("Berlin", "report")
+
+    assert store.dropped_writes == 1
+    assert "dropped a write" in capsys.readouterr().out
+
+
+def test_writer_restart_logs_why_it_stopped(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(artifact_store, "WRITER_RESTART_DELAY", 0)
+    store = unavailable_store(tmp_path)
+    store.save_run("Berlin", "report")
+    store._writer.join(5)
+
+    store.save_run("Berlin", "report")
+    out = capsys.readouterr().out
+    assert "Restarting artifact writer, which stopped after: artifact store unavailable" in out
@@ -0,0 +1,43 @@
+import pytest
+
+from city_index import canonical_city_key, canonicalize_city
+
+
+@pytest.mark.parametrize("text, wrong_city", [
+    ("Manhattan, Kansas", "us-new-york"),
+    ("Frisco, Texas", "us-san-francisco"),
+    ("London, Ontario", "gb-london"),
+    ("Sydney, Nova Scotia", "au-sydney"),
+])
+def test_mismatched_region_does_not_resolve_to_another_city(text, wrong_city):
+    assert canonicalize_city(text) is None
+    assert canonical_city_key(text) != wrong_city
+
+
+@pytest.mark.parametrize("text, city_id", [
+    ("New York, NY", "us-new-york"),
+    ("New York, New York", "us-new-york"),
+    ("Austin, TX, USA", "us-austin"),
+    ("Perth, WA", "au-perth"),
+    ("Indore, MP", "in-indore"),
+    ("berlin, germany", "de-berlin"),
+    ("London, UK", "gb-london"),
+    ("Berln", "de-berlin"),
+])
+def test_matching_region_or_country_resolves(text, city_id):
+    assert canonical_city_key(text) == city_id
+
+
+@pytest.mark.parametrize("typo, city_id", [
+    ("Berln", "de-berlin"),
+    ("Hamburgg", "de-hamburg"),
+    ("Philadelpia", "us-philadelphia"),
+])
+def test_typos_collapse_into_the_city(typo, city_id):
+    assert canonical_city_key(typo) == city_id
+
+
+def test_similar_short_name_is_not_collapsed_into_another_city():
+    # A different German town one letter away from Hamburg
+    assert canonicalize_city("Homburg") is None
+    assert canonical_city_key("Homburg") != "de-hamburg"
@@ -0,0 +1,63 @@
+import time
+
+from crewai_tools import SerperDevTool
+
+import artifact_store
+import crew_optimized
+from tools import FRESH_SEARCH_MAX_AGE, fresh_searches, search_cache, search_tool
+
+
+class FakeCrew:
+    def __init__(self, **kwargs):
+        pass
+
+    def kickoff(self):
+        return "**Area 1: Vijay Nagar**\nPrice: ₹1-₹2 | Yield: 5%"
+
+
+def test_local_market_data_input_is_recorded(monkeypatch):
+    saved = []
+    monkeypatch.setattr(crew_optimized, "Crew", FakeCrew)
+    monkeypatch.setattr(artifact_store.store, "save_run", lambda city, report, search_inputs, *args, **kwargs: saved.append(search_inputs))
+
+    crew_optimized.run_property_investment_analysis("Indore")
+
+    assert [item["query"] for item in saved[0]] == [{"local_market_data": "Indore"}]
+
+
+def count_serper_calls(monkeypatch):
+    calls = []
+
+    def fake_serper(self, **kwargs):
+        calls.append(kwargs)
+        return {"organic": [{"title": f"result {len(calls)}", "link": "http://example.com", "snippet": ""}]}
+
+    monkeypatch.setattr(SerperDevTool, "_run", fake_serper)
+    return calls
+
+
+def test_fresh_searches_skip_stale_cache_entries(monkeypatch):
+    calls = count_serper_calls(monkeypatch)
+    query = {"search_query": "retail property investment Testville best areas"}
+    # Within the cache TTL, but older than a freshness check accepts
+    search_cache.put(query, {"organic": []})
+    key = search_cache._key(query)
+    search_cache._entries[key] = (time.time() - FRESH_SEARCH_MAX_AGE - 1, {"organic": []})
+
+    assert search_tool.run(**query) == {"organic": []}
+    with fresh_searches():
+        result = search_tool.run(**query)
+    assert len(calls) == 1 and result["organic"][0]["title"] == "result 1"
+    # The fresh result replaces the stale one
+    assert search_tool.run(**query) == result
+
+
+def test_reuse_check_uses_a_recent_prefetch(monkeypatch):
+    calls = count_serper_calls(monkeypatch)
+    monkeypatch.setattr(artifact_store.store, "latest_run", lambda city: {"input_hash": "older-inputs"})
+
+    crew_optimized.prefetch_search_context("Prefetchville")
+    report, search_inputs = crew_optimized.reuse_if_inputs_unchanged("Prefetchville")
+
+    assert report is None and len(search_inputs) == len(crew_optimized.SEARCH_QUERIES)
+    assert len(calls) == len(crew_optimized.SEARCH_QUERIES)
@@ -0,0 +1,47 @@
+import threading
+import time
+
+from crewai_tools import SerperDevTool
+
+import artifact_store
+import crew_optimized
+from prefetch import SpeculativePrefetcher
+
+
+def test_wait_gives_up_on_a_slow_prefetch_and_cancels_it():
+    release = threading.Event()
+    prefetcher = SpeculativePrefetcher(lambda city_name, cancelled: release.wait(5))
+    job = prefetcher.prefetch("Berlin", owner="session-1")
+
+    started = time.monotonic()
+    assert not prefetcher.wait("Berlin", owner="session-1", timeout=0.2)
+    assert time.monotonic() - started < 1
+    assert job.cancelled.is_set()
+    assert prefetcher.status("Berlin") is None
+    release.set()
+
+
+def test_wait_keeps_a_prefetch_other_sessions_still_want():
+    release = threading.Event()
+    prefetcher = SpeculativePrefetcher(lambda city_name, cancelled: release.wait(5))
+    job = prefetcher.prefetch("Berlin", owner="session-1")
+    prefetcher.prefetch("Berlin", owner="session-2")
+
+    assert not prefetcher.wait("Berlin", owner="session-1", timeout=0.2)
+    assert not job.cancelled.is_set()
+    release.set()
+    assert prefetcher.wait("Berlin", owner="session-2")
+
+
+def test_joined_prefetch_feeds_the_reuse_check(monkeypatch):
+    calls = []
+    monkeypatch.setattr(SerperDevTool, "_run", lambda self, **kwargs: calls.append(kwargs) or {"organic": []})
+    monkeypatch.setattr(artifact_store.store, "latest_run", lambda city: {"input_hash": "older-inputs"})
+    prefetcher = SpeculativePrefetcher(crew_optimized.prefetch_search_context)
+
+    # Same order as app_cached: prefetch while typing, join it on click, then check for changes
+    prefetcher.prefetch("Leipzig", owner="session-1")
+    assert prefetcher.wait("Leipzig", owner="session-1")
+    crew_optimized.reuse_if_inputs_unchanged("Leipzig")
+
+    assert len(calls) == len(crew_optimized.SEARCH_QUERIES)
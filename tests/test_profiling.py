@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+import profiling
+from profiling import profile_run
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_explicit_off_keeps_nested_runs_off(monkeypatch, profile_dir):
+    monkeypatch.setenv(profiling.PROFILE_ENV, "1")
+    with profile_run("app-Berlin", enabled=False):
+        with profile_run("analysis-Berlin") as nested:
+            assert nested is None
+    assert os.listdir(profile_dir) == []
+
+
+def test_interrupted_run_is_closed_and_saved(profile_dir):
+    with pytest.raises(RuntimeError):
+        with profile_run("app-Berlin", enabled=True):
+            raise RuntimeError("script interrupted")
+
+    assert any(name.endswith(".folded") for name in os.listdir(profile_dir))
+    # Nothing is left active, so the next run profiles again
+    with profile_run("app-Munich", enabled=True) as result:
+        assert result is not None
@@ -0,0 +1,62 @@
+import litellm
+import pytest
+
+import retry_policy
+from llm_client import ResilientLLM
+from retry_policy import DEFAULT_POLICIES, CircuitOpenError, RetryPolicy
+
+
+def test_persistent_rate_limit_makes_exactly_policy_attempts(monkeypatch):
+    calls = []
+
+    def rate_limited(*args, **kwargs):
+        calls.append(kwargs.get("model"))
+        raise litellm.RateLimitError("Rate limit reached", llm_provider="groq", model="llama-3.3-70b-versatile")
+
+    monkeypatch.setattr(litellm, "completion", rate_limited)
+    # No real backoff or quota pauses in tests
+    monkeypatch.setattr(retry_policy.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(retry_policy.scheduler, "pause", lambda upstream, seconds: None)
+
+    llm = ResilientLLM(model="groq/llama-3.3-70b-versatile", api_key="test-key", max_retries=0)
+    with pytest.raises(Exception):
+        llm.call([{"role": "user", "content": "hi"}])
+
+    assert len(calls) == DEFAULT_POLICIES["groq"].max_attempts
+
+
+class ServiceUnavailable(Exception):
+    status_code = 503
+
+
+def fail_with(exc):
+    def call():
+        raise exc
+    return call
+
+
+def test_fatal_errors_do_not_reset_the_breaker(monkeypatch):
+    monkeypatch.setattr(retry_policy.time, "sleep", lambda seconds: None)
+    upstream = "test-alternating"
+    breaker = retry_policy.get_breaker(upstream)
+
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ValueError):
+            retry_policy.call_with_policy(upstream, fail_with(ValueError("bad request")))
+        with pytest.raises(ServiceUnavailable):
+            retry_policy.call_with_policy(upstream, fail_with(ServiceUnavailable()), policy=RetryPolicy(max_attempts=1))
+
+    assert breaker.state == "open"
+
+
+def test_open_breaker_rejects_calls_without_taking_quota(monkeypatch):
+    upstream = "test-open"
+    breaker = retry_policy.get_breaker(upstream)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    acquired = []
+    monkeypatch.setattr(retry_policy.scheduler, "acquire_call", lambda *args, **kwargs: acquired.append(args) or True)
+
+    with pytest.raises(CircuitOpenError):
+        retry_policy.call_with_policy(upstream, lambda: "ok")
+    assert acquired == []
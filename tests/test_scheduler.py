@@ -0,0 +1,13 @@
+from scheduler import Scheduler
+
+
+def test_notify_runs_outside_the_scheduler_lock():
+    scheduler = Scheduler(rates={"groq": 60})
+    scheduler.pause("groq", 1.5)
+    lock_held = []
+
+    def notify(message):
+        lock_held.append(scheduler._cond._is_owned())
+
+    assert scheduler.acquire_call("groq", timeout=5, notify=notify)
+    assert lock_held == [False]
@@ -0,0 +1,47 @@
+import litellm
+
+import llm_client
+from llm_client import ResilientLLM
+from token_budget import TokenBudget, count_tokens
+
+REPLY = "Mitte and Kreuzberg lead on yield."
+
+
+def reply_with_usage(usage):
+    def completion(*args, **kwargs):
+        return litellm.ModelResponse(
+            model="llama-3.3-70b-versatile",
+            choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": REPLY}}],
+            usage=usage,
+        )
+    return completion
+
+
+def recorded_completion_tokens(monkeypatch, tmp_path, usage):
+    budget = TokenBudget(path=str(tmp_path / "token_stats.json"))
+    monkeypatch.setattr(llm_client, "budget", budget)
+    monkeypatch.setattr(litellm, "completion", reply_with_usage(usage))
+
+    llm = ResilientLLM(model="groq/llama-3.3-70b-versatile", api_key="test-key", max_tokens=4000)
+    assert llm.call([{"role": "user", "content": "hi"}]) == REPLY
+    return list(budget._observations["default"])
+
+
+def test_records_reported_completion_tokens(monkeypatch, tmp_path):
+    usage = {"prompt_tokens": 10, "completion_tokens": 321, "total_tokens": 331}
+    assert recorded_completion_tokens(monkeypatch, tmp_path, usage) == [321]
+
+
+def test_falls_back_to_estimate_without_usage(monkeypatch, tmp_path):
+    assert recorded_completion_tokens(monkeypatch, tmp_path, None) == [count_tokens(text=REPLY)]
+
+
+def test_record_saves_in_the_background_not_per_call(tmp_path):
+    path = tmp_path / "token_stats.json"
+    budget = TokenBudget(path=str(path))
+    budget.record("analysis", 500)
+    budget.record("analysis", 700)
+    assert not path.exists()
+
+    budget.save()
+    assert list(TokenBudget(path=str(path))._observations["analysis"]) == [500, 700]
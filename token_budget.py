@@ -0,0 +1,139 @@
+import atexit
+import json
+import math
+import os
+import threading
+from collections import deque
+
+TOKEN_STATS_PATH = os.getenv("TOKEN_STATS_PATH", "token_stats.json")
+# New observations are written to disk in the background at most this often, and at exit
+TOKEN_STATS_SAVE_INTERVAL = 30  # Seconds
+
+# Completion-length percentile used to size max_tokens, plus headroom on top
+BUDGET_PERCENTILE = 95
+HEADROOM = 1.25
+MIN_HEADROOM_TOKENS = 64
+
+MIN_OBSERVATIONS = 5  # Use the configured ceiling until we have this many samples
+MIN_MAX_TOKENS = 256
+MAX_OBSERVATIONS = 200  # Per task; older observations are dropped
+
+# Warn when prompt + reserved completion gets this close to the context window
+CONTEXT_WARN_RATIO = 0.9
+CONTEXT_WINDOWS = {
+    "groq/llama-3.3-70b-versatile": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text=None, messages=None) -> int:
+    """
+    Approximate token count (~4 characters per token for Llama 3 on English text).
+
+    Deliberately local: exact tokenizers may download vocab files on first use,
+    which would put network I/O on every call's path. Headroom absorbs the error.
+    Completions use the provider's reported count instead when there is one.
+    """
+    if messages is not None:
+        text = " ".join(str(m.get("content", "")) for m in messages)
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+class TokenBudget:
+    """
+    Sizes ``max_tokens`` per task from observed completion lengths.
+
+    Groq's tokens-per-minute limit counts the reserved ``max_tokens``, so
+    reserving a high percentile of what a task actually produces (instead of
+    a fixed 6000/2000) lets more requests fit in each rate-limit window.
+    """
+
+    def __init__(self, path: str = TOKEN_STATS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        self._observations = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for task, values in data.items():
+            self._observations[task] = deque(values, maxlen=MAX_OBSERVATIONS)
+
+    def save(self):
+        """Write observations recorded since the last save to disk (no-op if there are none)."""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+            if timer is None:
+                return
+            timer.cancel()  # Harmless when called from the timer itself
+            data = {task: list(values) for task, values in self._observations.items()}
+        with self._save_lock:
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ Could not save token stats: {e}")
+
+    def record(self, task: str, completion_tokens: int, granted: int = None):
+        """
+        Record one completion's length for ``task``.
+
+        A completion that used (nearly) all of its grant was probably cut off,
+        so it is recorded as larger than it was to push the next budget up.
+        """
+        if granted and completion_tokens >= granted * 0.95:
+            completion_tokens = int(granted * 1.5)
+        with self._lock:
+            self._observations.setdefault(task, deque(maxlen=MAX_OBSERVATIONS)).append(completion_tokens)
+            # Written off the request path; see TOKEN_STATS_SAVE_INTERVAL
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(TOKEN_STATS_SAVE_INTERVAL, self.save)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def max_tokens_for(self, task: str, ceiling: int) -> int:
+        """max_tokens to reserve for the next call of ``task``, never above ``ceiling``."""
+        with self._lock:
+            values = sorted(self._observations.get(task, ()))
+        if len(values) < MIN_OBSERVATIONS:
+            return ceiling
+
+        idx = min(len(values) - 1, math.ceil(BUDGET_PERCENTILE / 100 * len(values)) - 1)
+        budget = max(values[idx] * HEADROOM, values[idx] + MIN_HEADROOM_TOKENS)
+        return int(min(ceiling, max(MIN_MAX_TOKENS, budget)))
+
+    def check_prompt(self, model: str, messages, max_tokens: int) -> int:
+        """Warn if the prompt plus reserved completion nears the model's context window."""
+        prompt_tokens = count_tokens(messages=messages)
+        context_window = CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+        if prompt_tokens + max_tokens >= context_window * CONTEXT_WARN_RATIO:
+            print(
+                f"⚠️ Prompt is {prompt_tokens} tokens (+{max_tokens} reserved) of "
+                f"{context_window} context for {model}; consider trimming search context."
+            )
+        return prompt_tokens
+
+    def summary(self):
+        """Per-task observation count and current budget, for inspection."""
+        with self._lock:
+            counts = {task: len(values) for task, values in self._observations.items()}
+        return {
+            task: {
+                "observations": count,
+                "max_tokens": self.max_tokens_for(task, ceiling=10 ** 6) if count >= MIN_OBSERVATIONS else None,
+            }
+            for task, count in counts.items()
+        }
+
+
+budget = TokenBudget()
+atexit.register(budget.save)
@@ -1,4 +1,161 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Type
+from crewai.tools import BaseTool
 from crewai_tools import SerperDevTool
+from pydantic import BaseModel, Field
+from artifact_store import current_run
+from http_pool import get_client
+from market_data import format_market_data, get_market_data
+from retry_policy import call_with_policy
 
+SERPER_TIMEOUT = 10
 
-search_tool = SerperDevTool()
\ No newline at end of file
+# Process-wide search cache; short TTL so content-based refreshes still see new results
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))  # 10 minutes
+SEARCH_CACHE_MAX_ENTRIES = 512
+# Cached results at most this old count as current for freshness checks, so the
+# reuse check can use a prefetch made while the user was typing
+FRESH_SEARCH_MAX_AGE = float(os.getenv("FRESH_SEARCH_MAX_AGE", "300"))  # 5 minutes
+
+
+class SearchCache:
+    """Thread-safe TTL + LRU cache of Serper results, shared by sessions and prefetches."""
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(query: dict) -> str:
+        normalized = {k: " ".join(str(v).lower().split()) for k, v in query.items()}
+        return json.dumps(normalized, sort_keys=True)
+
+    def get(self, query: dict, max_age: float = None):
+        """Cached result for ``query``, or None if missing, expired or older than ``max_age`` seconds."""
+        key = self._key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, result = entry
+            age = time.time() - stored_at
+            if age > self.ttl:
+                del self._entries[key]
+                return None
+            if max_age is not None and age > max_age:
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def put(self, query: dict, result):
+        key = self._key(query)
+        with self._lock:
+            self._entries[key] = (time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+search_cache = SearchCache()
+_search_max_age = contextvars.ContextVar("search_max_age", default=None)
+
+
+@contextmanager
+def fresh_searches(max_age: float = FRESH_SEARCH_MAX_AGE):
+    """
+    Answer searches in the block from ``search_cache`` only if at most ``max_age`` seconds old.
+
+    For checks whose point is to see current results (e.g. whether a city's
+    market data changed); older entries go to Serper and are refreshed.
+    """
+    token = _search_max_age.set(max_age)
+    try:
+        yield
+    finally:
+        _search_max_age.reset(token)
+
+
+class ResilientSerperDevTool(SerperDevTool):
+    """
+    Serper search tool whose individual searches go through the shared retry policy.
+
+    Requests are sent over the shared keep-alive pool in http_pool.py instead
+    of a new ``requests`` connection per search, and results are kept in
+    ``search_cache`` so prefetched searches are answered locally.
+    """
+
+    base_url: str = os.getenv("SERPER_BASE_URL", "https://google.serper.dev")
+
+    def _make_api_request(self, search_query: str, search_type: str) -> dict:
+        payload = {"q": search_query, "num": self.n_results}
+        if self.country:
+            payload["gl"] = self.country
+        if self.location:
+            payload["location"] = self.location
+        if self.locale:
+            payload["hl"] = self.locale
+
+        response = get_client().post(
+            self._get_search_url(search_type),
+            headers={"X-API-KEY": os.environ["SERPER_API_KEY"]},
+            json=payload,
+            timeout=SERPER_TIMEOUT,
+        )
+        response.raise_for_status()
+        results = response.json()
+        if not results:
+            raise ValueError("Empty response from Serper API")
+        return dict(results)
+
+    def _run(self, **kwargs):
+        recorder = current_run()
+        if recorder is not None:
+            # Searches prefetched for this run aren't sent to Serper a second time
+            cached = recorder.find_search(kwargs)
+            if cached is not None:
+                return cached
+
+        started = time.perf_counter()
+        result = search_cache.get(kwargs, max_age=_search_max_age.get())
+        if result is None:
+            result = call_with_policy("serper", super()._run, is_tool=True, **kwargs)
+            search_cache.put(kwargs, result)
+
+        # Keep the search inputs with the run's artifacts
+        if recorder is not None:
+            recorder.record_search(kwargs, result, time.perf_counter() - started)
+        return result
+
+
+class LocalMarketDataInput(BaseModel):
+    city: str = Field(..., description="City to look up, e.g. 'Indore'")
+    neighborhood: Optional[str] = Field(None, description="Optional neighborhood within the city")
+
+
+class LocalMarketDataTool(BaseTool):
+    """Answers price/yield questions from our own indexed market data (see market_data.py)."""
+
+    name: str = "Local market data"
+    description: str = (
+        "Look up neighborhood price ranges and rental yields for a city from our own market data. "
+        "Instant and free: always try this before searching the internet."
+    )
+    args_schema: Type[BaseModel] = LocalMarketDataInput
+
+    def _run(self, city: str, neighborhood: Optional[str] = None) -> str:
+        records = get_market_data().lookup(city, neighborhood)
+        if neighborhood:
+            return format_market_data(f"{neighborhood}, {city}", records, whole_city=False)
+        return format_market_data(city, records)
+
+
+search_tool = ResilientSerperDevTool()
+market_data_tool = LocalMarketDataTool()